@@ -0,0 +1,295 @@
+"""
+Measure the overhead of the adapter with an in-process fake RSGI server.
+
+Every scenario runs the same ASGI app twice: once called directly with a minimal
+ASGI receive/send (the baseline), and once through `ASGIToRSGI` with fake RSGI
+scope and protocol objects. The difference is the cost of the adapter.
+`retained blocks/req` counts the memory blocks still allocated after the requests,
+not every block allocated while handling them.
+
+Usage:
+    python benchmarks/bench_adapter.py
+    python benchmarks/bench_adapter.py --requests 20000 --scenario tiny_json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from rsgiadapter import ASGIToRSGI  # noqa: E402
+from rsgiadapter.protocol import RSGIHTTPProtocol  # noqa: E402
+
+
+class FakeScope:
+    """RSGI HTTP scope with the attributes `ASGIToRSGI` reads."""
+
+    def __init__(
+        self,
+        method: str = "GET",
+        path: str = "/",
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.proto = "http"
+        self.http_version = "1.1"
+        self.rsgi_version = "1.3"
+        self.server = "127.0.0.1:8000"
+        self.client = "127.0.0.1:50000"
+        self.scheme = "http"
+        self.method = method
+        self.path = path
+        self.query_string = ""
+        self.headers = headers or {}
+        self.authority = None
+
+
+class FakeTransport:
+    def __init__(self):
+        self.chunks = 0
+
+    async def send_bytes(self, data: bytes):
+        self.chunks += 1
+
+    async def send_str(self, data: str):
+        self.chunks += 1
+
+
+class FakeProtocol(RSGIHTTPProtocol):
+    """RSGI HTTP protocol built on the stub, request body chunks are given as args."""
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.response = None
+
+    async def __call__(self, *args, **kwargs):
+        body = b"".join(self.data)
+        self.data = []
+        return body
+
+    def response_empty(self, status, headers):
+        self.response = "empty"
+
+    def response_bytes(self, status, headers, body):
+        self.response = "bytes"
+
+    def response_str(self, status, headers, body):
+        self.response = "str"
+
+    def response_file(self, status, headers, file):
+        self.response = "file"
+
+    def response_stream(self, status, headers):
+        self.response = "stream"
+        return FakeTransport()
+
+
+async def read_body(receive) -> int:
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        size += len(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    return size
+
+
+def tiny_json_app():
+    payload = json.dumps({"status": "ok", "items": [1, 2, 3]}).encode()
+    headers = [(b"content-type", b"application/json")]
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": payload})
+
+    return app
+
+
+def large_body_app():
+    payload = b"x" * (4 * 1024 * 1024)
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": payload})
+
+    return app
+
+
+def many_chunks_app():
+    chunk = b"id,name,value\n"
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for _ in range(999):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": chunk})
+
+    return app
+
+
+def upload_app():
+    async def app(scope, receive, send):
+        size = await read_body(receive)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": str(size).encode()})
+
+    return app
+
+
+def file_app(path: str):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.pathsend", "path": path})
+
+    return app
+
+
+class Scenario:
+    def __init__(
+        self,
+        name: str,
+        app: Callable,
+        scope: Callable[[], FakeScope],
+        body: Callable[[], List[bytes]] = list,
+    ):
+        self.name = name
+        self.app = app
+        self.scope = scope
+        self.body = body
+
+
+def make_scenarios(file_path: str) -> List[Scenario]:
+    upload_chunk = b"u" * 16 * 1024
+    return [
+        Scenario("tiny_json", tiny_json_app(), FakeScope),
+        Scenario("large_body", large_body_app(), FakeScope),
+        Scenario("many_chunks", many_chunks_app(), FakeScope),
+        Scenario(
+            "streamed_upload",
+            upload_app(),
+            lambda: FakeScope("POST", headers={"transfer-encoding": "chunked"}),
+            lambda: [upload_chunk] * 64,
+        ),
+        Scenario("file_response", file_app(file_path), FakeScope),
+    ]
+
+
+def make_asgi_scope() -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": "GET",
+        "path": "/",
+        "raw_path": b"/",
+        "query_string": b"",
+        "headers": [],
+        "root_path": "",
+        "scheme": "http",
+        "server": ("127.0.0.1", 8000),
+        "client": ("127.0.0.1", 50000),
+        "state": {},
+    }
+
+
+async def run_baseline(scenario: Scenario):
+    """Call the app directly, without the adapter."""
+    chunks = iter(scenario.body())
+
+    async def receive():
+        chunk = next(chunks, None)
+        if chunk is None:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        return {"type": "http.request", "body": chunk, "more_body": True}
+
+    async def send(message):
+        pass
+
+    await scenario.app(make_asgi_scope(), receive, send)
+
+
+def make_adapter_runner(scenario: Scenario, **options):
+    rsgi_app = ASGIToRSGI(scenario.app, **options)
+
+    async def run():
+        await rsgi_app.__rsgi__(scenario.scope(), FakeProtocol(*scenario.body()))
+
+    return run
+
+
+async def measure(run: Callable, requests: int) -> Dict[str, float]:
+    for _ in range(min(requests, 100)):
+        await run()
+
+    gc.collect()
+    start = time.perf_counter_ns()
+    for _ in range(requests):
+        await run()
+    elapsed = time.perf_counter_ns() - start
+
+    alloc_requests = max(1, min(requests, 200))
+    gc.collect()
+    tracemalloc.start()
+    blocks = sys.getallocatedblocks()
+    for _ in range(alloc_requests):
+        await run()
+    _, peak = tracemalloc.get_traced_memory()
+    retained_blocks = sys.getallocatedblocks() - blocks
+    tracemalloc.stop()
+    return {
+        "ns": elapsed / requests,
+        "peak_kib": peak / 1024,
+        "retained_blocks": retained_blocks / alloc_requests,
+    }
+
+
+async def main(requests: int, names: List[str], streaming: bool) -> None:
+    with tempfile.NamedTemporaryFile(suffix=".bin") as file:
+        file.write(b"f" * 1024 * 1024)
+        file.flush()
+        scenarios = [
+            scenario
+            for scenario in make_scenarios(file.name)
+            if not names or scenario.name in names
+        ]
+        print(
+            f"{'scenario':<16} {'baseline ns':>12} {'adapter ns':>12} "
+            f"{'overhead ns':>12} {'peak KiB':>10} {'retained blocks/req':>20}"
+        )
+        for scenario in scenarios:
+            baseline = await measure(lambda: run_baseline(scenario), requests)
+            adapter = await measure(
+                make_adapter_runner(scenario, streaming=streaming), requests
+            )
+            print(
+                f"{scenario.name:<16} {baseline['ns']:>12.0f} {adapter['ns']:>12.0f} "
+                f"{adapter['ns'] - baseline['ns']:>12.0f} "
+                f"{adapter['peak_kib']:>10.1f} {adapter['retained_blocks']:>20.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--requests", type=int, default=2000)
+    parser.add_argument(
+        "-s",
+        "--scenario",
+        action="append",
+        default=[],
+        help="run only the given scenario, can be repeated",
+    )
+    parser.add_argument(
+        "--streaming", action="store_true", help="run the adapter in streaming mode"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.scenario, args.streaming))
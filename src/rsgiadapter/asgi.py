@@ -1,15 +1,33 @@
 import asyncio
-import atexit
 import inspect
 import logging
+import mimetypes
 from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from functools import lru_cache
 from os import PathLike, environ
-from typing import TYPE_CHECKING, Any, AsyncGenerator, Callable, Optional, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    Callable,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 from rsgiadapter.constant import (
     DEFAULT_ASGI_VERSION,
+    DEFAULT_BODY_READ_THRESHOLD,
+    DEFAULT_PRESIZE_THRESHOLD,
     DEFAULT_SPEC_VERSION,
+    HEADER_NAME_CACHE_SIZE,
+    RESPONSE_HEADER_CACHE_SIZE,
+    WEBSOCKET_CLOSE_INTERNAL_ERROR,
+    WEBSOCKET_CLOSE_NO_STATUS,
+    WEBSOCKET_CLOSE_NORMAL,
     EventTypeEnum,
+    WebsocketMessageType,
 )
 
 if TYPE_CHECKING:
@@ -19,15 +37,149 @@ if TYPE_CHECKING:
         RSGIHTTPScope,
         RSGIWebsocketProtocol,
         RSGIWebsocketScope,
+        RSGIWebsocketTransport,
     )
 
+from rsgiadapter.cache import CacheEntry, ResponseCache
+from rsgiadapter.coalesce import SingleFlight
+from rsgiadapter.compression import (
+    THREAD_COMPRESS_SIZE,
+    Compression,
+    encoded_headers,
+)
+from rsgiadapter.files import get_header, prepare_file_response
+from rsgiadapter.lifespan import LifespanProtocol
+from rsgiadapter.limiter import ConcurrencyLimiter
+from rsgiadapter.metrics import MetricsProtocol, RequestMetrics
+from rsgiadapter.multipart import (
+    FEED_BUFFER_SIZE,
+    MULTIPART_EXTENSION,
+    MultipartError,
+    MultipartParser,
+    MultipartUploads,
+)
+from rsgiadapter.offload import ThreadOffload
 from rsgiadapter.response import BodyManager, Response
+from rsgiadapter.transport import WatermarkTransport
 
 logger = logging.getLogger("rsgiadapter")
+WEBSOCKET_SCHEMES = {"http": "ws", "https": "wss"}
+# Extensions advertised in every scope, a new dict is built per scope since
+# middlewares may add per-request state to `scope["extensions"]`
+HTTP_EXTENSIONS = (
+    EventTypeEnum.PATH_SEND.value,
+    # sent as `Link` headers of the response, pushes only preload the resource
+    EventTypeEnum.EARLY_HINT.value,
+    EventTypeEnum.PUSH.value,
+)
+WEBSOCKET_EXTENSIONS = ()
+# `as` destination of a preload link, by content type prefix
+PRELOAD_DESTINATIONS = (
+    ("text/css", "style"),
+    ("text/javascript", "script"),
+    ("application/javascript", "script"),
+    ("application/json", "fetch"),
+    ("font/", "font"),
+    ("image/", "image"),
+    ("audio/", "audio"),
+    ("video/", "video"),
+)
 if environ.get("RSGI_ADAPTER_DEBUG", "0") == "1":
     logger.setLevel(logging.DEBUG)
 
 
+def make_asgi_info(asgi_version: str, spec_version: str) -> dict:
+    return {"version": asgi_version, "spec_version": spec_version}
+
+
+def make_extensions(names: Tuple[str, ...]) -> dict:
+    return {name: {} for name in names}
+
+
+def make_preload_link(path: str, headers) -> bytes:
+    """
+    The `Link` header preloading a pushed resource, its `as` destination comes from
+    the `Accept` header of the push, or the extension of `path`.
+    """
+    content_types = []
+    for name, value in headers:
+        if name.lower() == b"accept":
+            content_types.extend(
+                item.partition(";")[0].strip()
+                for item in value.decode("latin-1").split(",")
+            )
+    content_types.append(mimetypes.guess_type(path)[0] or "")
+    link = f"<{path}>; rel=preload"
+    for content_type in content_types:
+        for prefix, destination in PRELOAD_DESTINATIONS:
+            if content_type.startswith(prefix):
+                return f"{link}; as={destination}".encode("latin-1")
+    return link.encode("latin-1")
+
+
+@lru_cache(maxsize=16)
+def split_address(address: str) -> tuple:
+    """Split the server address, which is the same for every request of a worker."""
+    return tuple(address.split(":"))
+
+
+@lru_cache(maxsize=HEADER_NAME_CACHE_SIZE)
+def encode_header_name(name: str) -> bytes:
+    """Encode a request header name, common names are served from the cache."""
+    return name.encode("latin-1")
+
+
+@lru_cache(maxsize=RESPONSE_HEADER_CACHE_SIZE)
+def decode_header_name(name: bytes) -> str:
+    """
+    Decode a response header name for rsgi, common names are served from the cache.
+    Values are not cached, most are unique (`set-cookie`, `date`, `etag`) and must
+    not outlive the response.
+    """
+    return name.decode("latin-1")
+
+
+class RequestBodyTooLarge(Exception):
+    """The request body is larger than the configured `max_body_size`."""
+
+
+def get_content_length(scope: "RSGIHTTPScope") -> Optional[int]:
+    """The request `Content-Length`, None if missing or invalid."""
+    if not scope.headers:
+        return None
+    content_length = scope.headers.get("content-length")
+    if content_length is None:
+        return None
+    try:
+        return int(content_length)
+    except ValueError:
+        return None
+
+
+def get_response_content_length(headers: list) -> Optional[int]:
+    """The response `Content-Length` declared by the app, None if missing or invalid."""
+    content_length = get_header(headers, "content-length")
+    if content_length is None:
+        return None
+    try:
+        return int(content_length)
+    except ValueError:
+        return None
+
+
+def is_last_message(message: dict, trailers: bool = False) -> bool:
+    """
+    Whether the ASGI send `message` completes the response, the trailers complete
+    it when the response start announced `trailers`.
+    """
+    msg_type = message["type"]
+    if msg_type == EventTypeEnum.HTTP_RESP_BODY:
+        return not trailers and not message.get("more_body", False)
+    if msg_type == EventTypeEnum.HTTP_RESP_TRAILERS:
+        return not message.get("more_trailers", False)
+    return msg_type == EventTypeEnum.PATH_SEND
+
+
 class ASGIToRSGI:
 
     def __init__(
@@ -38,17 +190,71 @@ class ASGIToRSGI:
         ] = None,
         asgi_version: str = DEFAULT_ASGI_VERSION,
         spec_version: str = DEFAULT_SPEC_VERSION,
+        streaming: bool = False,
+        body_spill_threshold: Optional[int] = None,
+        response_chunk_size: Optional[int] = None,
+        body_read_threshold: Optional[int] = DEFAULT_BODY_READ_THRESHOLD,
+        disconnect_grace_period: Optional[float] = None,
+        asgi_lifespan: Optional[bool] = None,
+        send_high_watermark: Optional[int] = None,
+        send_low_watermark: Optional[int] = None,
+        metrics_callback: Optional[Callable[[RequestMetrics], Any]] = None,
+        max_body_size: Optional[int] = None,
+        compression: Optional[Compression] = None,
+        cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        presize_threshold: Optional[int] = DEFAULT_PRESIZE_THRESHOLD,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        offload: Optional[ThreadOffload] = None,
+        multipart: Optional[MultipartUploads] = None,
     ):
+        if streaming and single_flight is not None:
+            # streamed responses are never shared, requests would only wait
+            raise ValueError("single_flight can't be used with streaming=True")
         self.asgi_application = asgi_application
         self.asgi_version = asgi_version
         self.spec_version = spec_version
+        # One adapter handles every request, per-request state lives in RequestContext
+        self.adapter = ASGIToRSGIAdapter(
+            asgi_application,
+            asgi_version,
+            spec_version,
+            streaming=streaming,
+            body_spill_threshold=body_spill_threshold,
+            response_chunk_size=response_chunk_size,
+            body_read_threshold=body_read_threshold,
+            disconnect_grace_period=disconnect_grace_period,
+            send_high_watermark=send_high_watermark,
+            send_low_watermark=send_low_watermark,
+            metrics_callback=metrics_callback,
+            max_body_size=max_body_size,
+            compression=compression,
+            cache=cache,
+            single_flight=single_flight,
+            presize_threshold=presize_threshold,
+            limiter=limiter,
+            offload=offload,
+            multipart=multipart,
+        )
         self.lifespan = None
+        self.lifespan_started = False
         self.register_lifespan(lifespan)
+        # Run the app's own lifespan by default when no lifespan is given
+        self.asgi_lifespan = (
+            lifespan is None if asgi_lifespan is None else asgi_lifespan
+        )
+        self.lifespan_protocol: Optional[LifespanProtocol] = None
 
     async def __rsgi__(self, scope, protocol):
-        await ASGIToRSGIAdapter(
-            self.asgi_application, self.asgi_version, self.spec_version
-        )(scope, protocol)
+        await self.adapter(scope, protocol)
+
+    def __rsgi_init__(self, loop: asyncio.AbstractEventLoop):
+        """Run the lifespan startup on the worker loop, before it serves requests."""
+        loop.run_until_complete(self.startup())
+
+    def __rsgi_del__(self, loop: asyncio.AbstractEventLoop):
+        """Run the lifespan shutdown on the worker loop, after it stopped serving."""
+        loop.run_until_complete(self.shutdown())
 
     def register_lifespan(self, lifespan):
         if lifespan is None:
@@ -64,18 +270,94 @@ class ASGIToRSGI:
             self.lifespan = lifespan(self.asgi_application)
         except TypeError:
             self.lifespan = lifespan()
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(self.lifespan.__aenter__())
-        atexit.register(self.atexit_shutdown)
 
-    def atexit_shutdown(self):
-        if self.lifespan is None:
+    async def startup(self):
+        if self.asgi_lifespan and self.lifespan_protocol is None:
+            self.lifespan_protocol = LifespanProtocol(self.asgi_application)
+            await self.lifespan_protocol.startup()
+            if self.lifespan_protocol.failure_startup:
+                raise RuntimeError("ASGI lifespan startup failed")
+            self.adapter.state = self.lifespan_protocol.state
+        if self.lifespan is None or self.lifespan_started:
             return
-        try:
-            loop = asyncio.get_event_loop()
-            loop.run_until_complete(self.lifespan.__aexit__(None, None, None))
-        except Exception as e:
-            logger.exception(e)
+        await self.lifespan.__aenter__()
+        self.lifespan_started = True
+
+    async def shutdown(self):
+        if self.lifespan_started:
+            self.lifespan_started = False
+            try:
+                await self.lifespan.__aexit__(None, None, None)
+            except Exception as e:
+                logger.exception(e)
+        if self.lifespan_protocol is not None:
+            lifespan_protocol, self.lifespan_protocol = self.lifespan_protocol, None
+            await lifespan_protocol.shutdown()
+            if lifespan_protocol.failure_shutdown:
+                logger.error("ASGI lifespan shutdown failed")
+        if self.adapter.offload is not None:
+            await self.adapter.offload.shutdown()
+
+
+class RequestContext:
+    """
+    State of a single request handled by `ASGIToRSGIAdapter`.
+    """
+
+    __slots__ = (
+        "event_status",
+        "state",
+        "response_started",
+        "response_content_length",
+        "response_status",
+        "response_headers",
+        "transport",
+        "response_complete",
+        "disconnected",
+        "scope",
+        "streaming",
+        "buffered_size",
+        "body_too_large",
+        "compressor",
+        "presized",
+        "presized_size",
+        "trailers",
+        "early_hints",
+        "start_headers",
+    )
+
+    def __init__(self, state: Optional[dict] = None, scope=None):
+        # rsgi scope of the request
+        self.scope = scope
+        self.event_status = EventTypeEnum.HTTP_REQUEST
+        self.state = {} if state is None else state
+        self.response_started = False
+        self.response_content_length = None
+        self.response_status = None
+        self.response_headers = None
+        self.transport = None
+        self.response_complete: Optional[asyncio.Event] = None
+        self.disconnected = False
+        self.streaming = False
+        self.buffered_size = 0
+        self.body_too_large = False
+        # StreamCompressor of a compressed streamed response
+        self.compressor = None
+        # Chunks held until a pre-sized response is complete
+        self.presized: Optional[list] = None
+        self.presized_size = 0
+        # Whether the app announced response trailers
+        self.trailers = False
+        # Links of the early hints sent before the response start, None after it
+        self.early_hints: Optional[Sequence[bytes]] = ()
+        # ASGI headers of a buffered response start, pushes sent after it add links
+        self.start_headers: Optional[list] = None
+
+    def complete(self):
+        """Mark the response as complete, the app then sees the request disconnected."""
+        self.event_status = EventTypeEnum.HTTP_DISCONNECT
+        if self.response_complete is not None:
+            self.response_complete.set()
 
 
 class ASGIToRSGIAdapter:
@@ -84,34 +366,91 @@ class ASGIToRSGIAdapter:
         asgi_app,
         asgi_version=DEFAULT_ASGI_VERSION,
         spec_version=DEFAULT_SPEC_VERSION,
+        streaming=False,
+        body_spill_threshold=None,
+        response_chunk_size=None,
+        body_read_threshold=DEFAULT_BODY_READ_THRESHOLD,
+        disconnect_grace_period=None,
+        send_high_watermark=None,
+        send_low_watermark=None,
+        metrics_callback=None,
+        max_body_size=None,
+        compression=None,
+        cache=None,
+        single_flight=None,
+        presize_threshold=DEFAULT_PRESIZE_THRESHOLD,
+        limiter=None,
+        offload=None,
+        multipart=None,
     ):
         self.asgi_app = asgi_app
         self.asgi_version = asgi_version
         self.spec_version = spec_version
-        self.event_status = EventTypeEnum.HTTP_REQUEST
-
+        self.streaming = streaming
+        self.body_spill_threshold = body_spill_threshold
+        self.response_chunk_size = response_chunk_size
+        self.body_read_threshold = body_read_threshold
+        self.disconnect_grace_period = disconnect_grace_period
+        # Bytes the app can send ahead of the client before `send()` blocks
+        self.send_high_watermark = send_high_watermark
+        self.send_low_watermark = send_low_watermark
+        # Called with the RequestMetrics of every HTTP request, when set
+        self.metrics_callback = metrics_callback
+        # Requests with a larger body are answered with 413
+        self.max_body_size = max_body_size
+        # Compression applied to the responses, when set
+        self.compression = compression
+        # ResponseCache of the buffered GET responses, when set
+        self.cache = cache
+        # SingleFlight coalescing identical concurrent GET requests, when set
+        self.single_flight = single_flight
+        # Multi-chunk responses with a declared Content-Length up to this size are
+        # sent with a single `response_bytes` call
+        self.presize_threshold = presize_threshold
+        # ConcurrencyLimiter shedding HTTP requests over its limit, when set
+        self.limiter = limiter
+        # ThreadOffload running the app of some paths in a thread pool, when set
+        self.offload = offload
+        # MultipartUploads writing the uploaded files to disk, when set
+        self.multipart = multipart
+        # Lifespan state, shallow copied into every request scope
         self.state = {}
-        self.response_started = False
-        self.response_content_length = None
+        # Whether a push sent after the response start was logged
+        self.late_push_logged = False
 
     async def yield_body(
-        self, protocol: Union["RSGIHTTPProtocol", "RSGIWebsocketProtocol"]
+        self,
+        protocol: Union["RSGIHTTPProtocol", "RSGIWebsocketProtocol"],
+        max_size: Optional[int] = None,
     ) -> AsyncGenerator:
         """
         Asynchronously yields messages from the given rsgi `protocol`.
 
         Args:
             protocol (RSGIHTTPProtocol | RSGIWebsocketProtocol): RSGIHTTPProtocol or RSGIWebsocketProtocol instance.
+            max_size (int): Maximum body size in bytes, no limit if None.
 
         Yields:
             Any: The next message from the rsgi protocol.
 
+        Raises:
+            RequestBodyTooLarge: If the body is larger than `max_size`.
         """
+        if max_size is None:
+            async for msg in protocol:
+                yield msg
+            return
+        size = 0
         async for msg in protocol:
+            size += len(msg)
+            if size > max_size:
+                raise RequestBodyTooLarge(f"Request body larger than {max_size} bytes")
             yield msg
 
     def make_asgi_scope(
-        self, scope: Union["RSGIHTTPScope", "RSGIWebsocketScope"]
+        self,
+        scope: Union["RSGIHTTPScope", "RSGIWebsocketScope"],
+        state: Optional[dict] = None,
     ) -> "ASGIScope":
         """
         Generates an ASGI scope based on RSGI scope, extracting relevant information,
@@ -120,6 +459,7 @@ class ASGIToRSGIAdapter:
 
         Args:
             scope (Union["RSGIHTTPScope", "RSGIWebsocketScope"]): The scope object containing the necessary information.
+            state (dict): The request state, a new dict if not given.
 
         Returns:
             dict: A dictionary representing the ASGI scope with version details
@@ -130,11 +470,12 @@ class ASGIToRSGIAdapter:
         if not scope:
             raise ValueError("Scope cannot be None")
 
-        asgi_version = self.asgi_version
-        spec_version = self.spec_version
+        if state is None:
+            state = {}
+        asgi_info = make_asgi_info(self.asgi_version, self.spec_version)
         proto = scope.proto
         http_version = scope.http_version
-        server = scope.server.split(":") if scope.server else []
+        server = list(split_address(scope.server)) if scope.server else []
         client = scope.client.split(":") if scope.client else []
         scheme = scope.scheme
         method = scope.method
@@ -145,16 +486,41 @@ class ASGIToRSGIAdapter:
         )
         headers = (
             [
-                (k.encode("latin-1"), v.encode("latin-1"))
+                (encode_header_name(k), v.encode("latin-1"))
                 for k, v in scope.headers.items()
             ]
             if scope.headers
             else []
         )
 
+        if proto == "websocket":
+            subprotocols = (
+                scope.headers.get("sec-websocket-protocol") if scope.headers else None
+            )
+            return {
+                "asgi": asgi_info,
+                "extensions": make_extensions(WEBSOCKET_EXTENSIONS),
+                "type": proto,
+                "http_version": http_version,
+                "server": server,
+                "client": client,
+                "scheme": WEBSOCKET_SCHEMES.get(scheme, scheme),
+                "path": path,
+                "raw_path": raw_path,
+                "query_string": query_string,
+                "headers": headers,
+                "root_path": "",
+                "state": state,
+                "subprotocols": (
+                    [item.strip() for item in subprotocols.split(",")]
+                    if subprotocols
+                    else []
+                ),
+            }
+
         return {
-            "asgi": {"version": asgi_version, "spec_version": spec_version},
-            "extensions": {"http.response.pathsend": {}},
+            "asgi": asgi_info,
+            "extensions": make_extensions(HTTP_EXTENSIONS),
             "type": proto,
             "http_version": http_version,
             "server": server,
@@ -166,7 +532,7 @@ class ASGIToRSGIAdapter:
             "query_string": query_string,
             "headers": headers,
             "root_path": "",
-            "state": self.state,
+            "state": state,
         }
 
     async def __call__(
@@ -174,76 +540,831 @@ class ASGIToRSGIAdapter:
         scope: Union["RSGIHTTPScope", "RSGIWebsocketScope"],
         protocol: Union["RSGIHTTPProtocol", "RSGIWebsocketProtocol"],
     ):
-        asgi_scope = self.make_asgi_scope(scope)
-        send_queue = asyncio.Queue()
-        asgi_body = self.yield_body(protocol)
+        if scope.proto == "websocket":
+            await self.handle_websocket(scope, protocol)
+            return
+        metrics = None
+        if self.metrics_callback is not None:
+            metrics = RequestMetrics(scope.method, scope.path)
+            protocol = MetricsProtocol(protocol, metrics)
+        if self.limiter is None:
+            await self.dispatch_http(scope, protocol, metrics)
+            return
+        if not await self.limiter.acquire():
+            protocol.response_empty(status=503, headers=self.limiter.shed_headers)
+            if metrics is not None:
+                self.report_metrics(metrics)
+            return
+        try:
+            await self.dispatch_http(scope, protocol, metrics)
+        finally:
+            self.limiter.release()
 
-        async def receive():
+    async def dispatch_http(
+        self,
+        scope: "RSGIHTTPScope",
+        protocol: "RSGIHTTPProtocol",
+        metrics: Optional[RequestMetrics] = None,
+    ) -> None:
+        content_length = get_content_length(scope)
+        if (
+            self.max_body_size is not None
+            and content_length is not None
+            and content_length > self.max_body_size
+        ):
+            # Rejected before the app, the body is never read
+            protocol.response_empty(status=413, headers=[("connection", "close")])
+            if metrics is not None:
+                self.report_metrics(metrics)
+            return
+        if self.multipart is not None:
             try:
+                parser = self.multipart.parser(scope)
+            except MultipartError:
+                logger.debug("Invalid multipart boundary", exc_info=True)
+                protocol.response_empty(status=400, headers=[("connection", "close")])
+                if metrics is not None:
+                    self.report_metrics(metrics)
+                return
+            if parser is not None:
+                await self.handle_multipart(parser, scope, protocol, metrics)
+                return
+        if self.single_flight is not None:
+            flight_key = self.single_flight.key(scope, self.request_encoding(scope))
+            if flight_key is not None:
+                await self.handle_coalesced(flight_key, scope, protocol, metrics)
+                return
+        await self.handle_http(scope, protocol, metrics)
+
+    async def handle_coalesced(
+        self,
+        key: tuple,
+        scope: "RSGIHTTPScope",
+        protocol: "RSGIHTTPProtocol",
+        metrics: Optional[RequestMetrics] = None,
+    ) -> None:
+        """
+        Answer a request with the response of the identical request in flight, or
+        handle it and share its response with the identical requests coming meanwhile.
+        """
+        leader = self.single_flight.leader(key)
+        if leader is None:
+            flight = (key, self.single_flight.start(key))
+            try:
+                await self.handle_http(scope, protocol, metrics, flight)
+            finally:
+                self.single_flight.finish(*flight)
+            return
+        entry = await asyncio.shield(leader)
+        if entry is None:
+            await self.handle_http(scope, protocol, metrics)
+            return
+        self.single_flight.coalesced += 1
+        self.send_cached(protocol, entry, scope, age=False)
+        if metrics is not None:
+            self.report_metrics(metrics)
+
+    async def handle_multipart(
+        self,
+        parser: MultipartParser,
+        scope: "RSGIHTTPScope",
+        protocol: "RSGIHTTPProtocol",
+        metrics: Optional[RequestMetrics] = None,
+    ) -> None:
+        """
+        Parse a multipart/form-data body into temporary files, then call the app
+        with the parsed body in the scope extension. Invalid bodies get a 400.
+        The parser opens and writes the files, it is fed in a worker thread.
+        """
+        try:
+            try:
+                pending = bytearray()
+                async for chunk in self.yield_body(protocol, self.max_body_size):
+                    pending += chunk
+                    if len(pending) >= FEED_BUFFER_SIZE:
+                        await asyncio.to_thread(parser.feed, bytes(pending))
+                        pending.clear()
+                if pending:
+                    await asyncio.to_thread(parser.feed, bytes(pending))
+                uploads = parser.finish()
+            except RequestBodyTooLarge:
+                protocol.response_empty(status=413, headers=[("connection", "close")])
+            except MultipartError:
+                logger.debug("Invalid multipart body", exc_info=True)
+                protocol.response_empty(status=400, headers=[("connection", "close")])
+            else:
+                await self.handle_http(scope, protocol, metrics, uploads=uploads)
+                return
+            if metrics is not None:
+                self.report_metrics(metrics)
+        finally:
+            parser.cleanup()
+
+    async def handle_http(
+        self,
+        scope: "RSGIHTTPScope",
+        protocol: "RSGIHTTPProtocol",
+        metrics: Optional[RequestMetrics] = None,
+        flight: Optional[Tuple[tuple, asyncio.Future]] = None,
+        uploads: Optional[dict] = None,
+    ) -> None:
+        """
+        Call the app for an HTTP request and send its response. `flight` is the key
+        and the future of the single-flight the request leads, if any.
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.key(scope, self.request_encoding(scope))
+            entry = None if cache_key is None else self.cache.get(cache_key)
+            if entry is not None:
+                self.send_cached(protocol, entry, scope)
+                if metrics is not None:
+                    self.report_metrics(metrics)
+                return
+        ctx = RequestContext(self.state.copy(), scope)
+        asgi_scope = self.make_asgi_scope(scope, ctx.state)
+        if uploads is not None:
+            asgi_scope["extensions"][MULTIPART_EXTENSION] = uploads
+            # the app receives an empty body, its headers must not announce one
+            asgi_scope["headers"] = [
+                (name, value)
+                for name, value in asgi_scope["headers"]
+                if name not in (b"content-length", b"transfer-encoding")
+            ]
+            asgi_scope["headers"].append((b"content-length", b"0"))
+        if metrics is not None:
+            metrics.mark("scope")
+        if uploads is not None:
+            # the body was consumed by the multipart parser
+            body_read = False
+
+            async def receive():
+                nonlocal body_read
+                if body_read:
+                    return await self.receive_disconnect(ctx, protocol)
+                body_read = True
+                return {"type": ctx.event_status, "body": b"", "more_body": False}
+
+        elif self.read_body_at_once(get_content_length(scope)):
+            body_read = False
+
+            async def receive():
+                nonlocal body_read
+                if body_read:
+                    return await self.receive_disconnect(ctx, protocol)
+                body_read = True
+                try:
+                    body = await protocol()
+                except Exception:
+                    logger.debug("Failed to read request body", exc_info=True)
+                    ctx.disconnected = True
+                    return {"type": EventTypeEnum.HTTP_DISCONNECT}
+                return {"type": ctx.event_status, "body": body, "more_body": False}
+
+        else:
+            asgi_body = self.yield_body(protocol, self.max_body_size)
+            body_read = False
+
+            async def receive():
+                nonlocal body_read
+                if body_read:
+                    return await self.receive_disconnect(ctx, protocol)
+                try:
+                    return {
+                        "type": ctx.event_status,
+                        "body": await anext(asgi_body),
+                        "more_body": True,
+                    }
+                except StopAsyncIteration:
+                    body_read = True
+                    return {
+                        "type": ctx.event_status,
+                        "body": b"",
+                        "more_body": False,
+                    }
+                except RequestBodyTooLarge:
+                    body_read = True
+                    ctx.body_too_large = True
+                    ctx.disconnected = True
+                    return {"type": EventTypeEnum.HTTP_DISCONNECT}
+                except Exception:
+                    logger.debug("Failed to read request body", exc_info=True)
+                    body_read = True
+                    ctx.disconnected = True
+                    return {"type": EventTypeEnum.HTTP_DISCONNECT}
+
+        ctx.streaming = self.streaming
+        send_queue = None if self.streaming else asyncio.Queue()
+
+        async def send(msg):
+            if is_last_message(msg, ctx.trailers):
+                ctx.complete()
+            msg = self.apply_extensions(ctx, msg)
+            if msg is None:
+                return
+            if ctx.streaming:
+                await self.stream_message(ctx, protocol, msg)
+                return
+            await send_queue.put(msg)
+            if (
+                self.send_high_watermark is not None
+                and msg["type"] == EventTypeEnum.HTTP_RESP_BODY
+                and msg.get("more_body", False)
+            ):
+                ctx.buffered_size += len(msg.get("body", b""))
+                if ctx.buffered_size > self.send_high_watermark:
+                    # Too large to buffer, stream the rest of the response
+                    ctx.streaming = True
+                    if flight is not None:
+                        # a streamed response is not shared, release the waiters
+                        self.single_flight.finish(*flight)
+                    while not send_queue.empty():
+                        await self.stream_message(
+                            ctx, protocol, send_queue.get_nowait()
+                        )
+
+        watcher = None
+        if self.disconnect_grace_period is not None and hasattr(
+            protocol, "client_disconnect"
+        ):
+            watcher = asyncio.ensure_future(
+                self.cancel_on_disconnect(ctx, protocol, asyncio.current_task())
+            )
+        try:
+            if self.offload is not None and self.offload.matches(scope.path):
+                await self.offload.run(self.asgi_app, asgi_scope, receive, send)
+            else:
+                await self.asgi_app(asgi_scope, receive, send)
+        except asyncio.CancelledError:
+            logger.debug("ASGI app cancelled")
+        except Exception:
+            logger.info("ASGI app raised an exception", exc_info=True)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+        if metrics is not None:
+            metrics.mark("app")
+
+        if ctx.disconnected:
+            if isinstance(ctx.transport, WatermarkTransport):
+                await ctx.transport.close(abort=True)
+            if ctx.body_too_large and not ctx.response_started:
+                # The app response is dropped, the body was not fully read
+                protocol.response_empty(status=413, headers=[("connection", "close")])
+        elif ctx.streaming:
+            await self.finish_stream(ctx, protocol)
+        else:
+            response = await self.get_response(send_queue)
+            if metrics is not None:
+                metrics.mark("buffer")
+            max_age = None
+            if cache_key is not None and scope.method == "GET":
+                max_age = self.cache.max_age(response.status, response.headers)
+            if (
+                self.compression is not None
+                and response.status
+                and response.path is None
+            ):
+                await self.compress_response(response, scope)
+            # the cache and the waiting requests get the response as it is sent
+            if max_age is not None:
+                self.cache_response(cache_key, response, max_age)
+            if flight is not None:
+                self.share_response(flight, response)
+            await self.perform_response(protocol, response, scope)
+
+        if metrics is not None:
+            metrics.mark("response")
+            metrics.disconnected = ctx.disconnected
+            self.report_metrics(metrics)
+
+    def report_metrics(self, metrics: RequestMetrics):
+        metrics.finish()
+        try:
+            self.metrics_callback(metrics)
+        except Exception:
+            logger.warning("Metrics callback raised an exception", exc_info=True)
+
+    async def receive_disconnect(
+        self,
+        ctx: RequestContext,
+        protocol: "RSGIHTTPProtocol",
+    ) -> dict:
+        """
+        Wait until the client disconnects or the response is complete, then return
+        `http.disconnect`. Used once the request body has been fully received.
+        """
+        if ctx.event_status == EventTypeEnum.HTTP_DISCONNECT or ctx.disconnected:
+            return {"type": EventTypeEnum.HTTP_DISCONNECT}
+        if ctx.response_complete is None:
+            ctx.response_complete = asyncio.Event()
+        waiters = [asyncio.ensure_future(ctx.response_complete.wait())]
+        client_disconnect = getattr(protocol, "client_disconnect", None)
+        if client_disconnect is not None:
+            waiters.append(asyncio.ensure_future(client_disconnect()))
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        if not ctx.response_complete.is_set():
+            ctx.disconnected = True
+        return {"type": EventTypeEnum.HTTP_DISCONNECT}
+
+    async def cancel_on_disconnect(
+        self,
+        ctx: RequestContext,
+        protocol: "RSGIHTTPProtocol",
+        task: asyncio.Task,
+    ) -> None:
+        """
+        Cancel the request `task` when the client disconnects before the response is
+        complete, after waiting `disconnect_grace_period` seconds for the app to finish.
+        """
+        await protocol.client_disconnect()
+        if ctx.event_status == EventTypeEnum.HTTP_DISCONNECT:
+            return
+        ctx.disconnected = True
+        if self.disconnect_grace_period:
+            await asyncio.sleep(self.disconnect_grace_period)
+        logger.debug("Client disconnected, cancelling ASGI app")
+        task.cancel()
+
+    def read_body_at_once(self, content_length: Optional[int]) -> bool:
+        """
+        Whether the request body should be read with a single `await protocol()`
+        call instead of being streamed, which is the case when the request declares
+        a `Content-Length` not larger than `body_read_threshold`.
+        """
+        if self.body_read_threshold is None or content_length is None:
+            return False
+        return content_length <= self.body_read_threshold
+
+    async def handle_websocket(
+        self, scope: "RSGIWebsocketScope", protocol: "RSGIWebsocketProtocol"
+    ):
+        """
+        Run the ASGI app for a websocket connection.
+
+        `websocket.accept` opens the rsgi transport with `protocol.accept()`, frames
+        are passed to and from the transport as they are, and `websocket.close`
+        (or `websocket.close` before accept, to reject the connection) maps to
+        `protocol.close()`. The connection is closed when the app returns.
+        """
+        asgi_scope = self.make_asgi_scope(scope, self.state.copy())
+        transport: Optional["RSGIWebsocketTransport"] = None
+        connected = False
+        disconnected = False
+        closed = False
+
+        async def receive():
+            nonlocal connected, disconnected
+            if not connected:
+                connected = True
+                return {"type": EventTypeEnum.WEBSOCKET_CONNECT}
+            if transport is None or disconnected or closed:
                 return {
-                    "type": self.event_status,
-                    "body": await anext(asgi_body),
-                    "more_body": True,
-                }
-            except StopAsyncIteration:
-                return {
-                    "type": self.event_status,
-                    "body": b"",
-                    "more_body": False,
+                    "type": EventTypeEnum.WEBSOCKET_DISCONNECT,
+                    "code": WEBSOCKET_CLOSE_NO_STATUS,
                 }
+            message = await transport.receive()
+            if message.kind == WebsocketMessageType.bytes:
+                return {"type": EventTypeEnum.WEBSOCKET_RECEIVE, "bytes": message.data}
+            if message.kind == WebsocketMessageType.string:
+                return {"type": EventTypeEnum.WEBSOCKET_RECEIVE, "text": message.data}
+            disconnected = True
+            return {
+                "type": EventTypeEnum.WEBSOCKET_DISCONNECT,
+                "code": WEBSOCKET_CLOSE_NO_STATUS,
+            }
 
         async def send(msg):
-            if msg.get("more_body", None) is False:
-                self.event_status = EventTypeEnum.HTTP_DISCONNECT
-            await send_queue.put(msg)
+            nonlocal transport, closed
+            msg_type = msg["type"]
+            if msg_type == EventTypeEnum.WEBSOCKET_SEND:
+                if transport is None or disconnected or closed:
+                    raise RuntimeError("Cannot send on a websocket that is not open")
+                text = msg.get("text")
+                if text is not None:
+                    await transport.send_str(text)
+                else:
+                    await transport.send_bytes(msg.get("bytes") or b"")
+            elif msg_type == EventTypeEnum.WEBSOCKET_ACCEPT:
+                if transport is None and not closed:
+                    if msg.get("subprotocol") or msg.get("headers"):
+                        logger.warning(
+                            "websocket.accept subprotocol and headers dropped, "
+                            "rsgi accept() can't send them"
+                        )
+                    transport = await protocol.accept()
+            elif msg_type == EventTypeEnum.WEBSOCKET_CLOSE:
+                if not closed:
+                    closed = True
+                    protocol.close(msg.get("code", WEBSOCKET_CLOSE_NORMAL))
 
+        close_code = WEBSOCKET_CLOSE_NORMAL
         try:
             await self.asgi_app(asgi_scope, receive, send)
         except asyncio.CancelledError:
             logger.debug("ASGI app cancelled")
         except Exception:
+            close_code = WEBSOCKET_CLOSE_INTERNAL_ERROR
             logger.info("ASGI app raised an exception", exc_info=True)
-        response = await self.get_response(send_queue)
+        if not closed:
+            # closing before accept rejects the connection
+            protocol.close(close_code if transport is not None else None)
+
+    @staticmethod
+    def make_rsgi_headers(headers) -> list:
+        try:
+            return [(decode_header_name(k), v.decode("latin-1")) for k, v in headers]
+        except TypeError:
+            # unhashable header, like bytearray
+            return [
+                (bytes(k).decode("latin-1"), bytes(v).decode("latin-1"))
+                for k, v in headers
+            ]
+
+    def apply_extensions(self, ctx: RequestContext, message: dict) -> Optional[dict]:
+        """
+        Handle the ASGI extension messages the rsgi protocol has no call for,
+        return None when the message is consumed.
+
+        RSGI can't send informational responses, so the links of early hints and
+        server pushes sent before the response start are added to the response
+        as `Link` headers, which browsers and HTTP/2 proxies use to preload them.
+        Pushes are never pushed, only preloaded: pushes sent after the response
+        start are added while the headers are not sent, then dropped. Trailers are
+        dropped, RSGI has no trailer frames.
+        """
+        msg_type = message["type"]
+        if msg_type == EventTypeEnum.HTTP_RESP_START:
+            ctx.trailers = message.get("trailers", False)
+            links, ctx.early_hints = ctx.early_hints, None
+            if not links and ctx.streaming:
+                return message
+            headers = list(message.get("headers", ()))
+            headers.extend((b"link", link) for link in links)
+            if not ctx.streaming:
+                ctx.start_headers = headers
+            return {**message, "headers": headers}
+        if msg_type == EventTypeEnum.EARLY_HINT:
+            links = [
+                link if isinstance(link, bytes) else link.encode("latin-1")
+                for link in message.get("links", ())
+            ]
+        elif msg_type == EventTypeEnum.PUSH:
+            if ctx.early_hints is None:
+                self.add_late_push(ctx, message)
+                return None
+            links = [make_preload_link(message["path"], message.get("headers", ()))]
+        elif msg_type == EventTypeEnum.HTTP_RESP_TRAILERS:
+            logger.debug("Response trailers dropped, not supported by rsgi")
+            return None
+        else:
+            return message
+        if ctx.early_hints is not None:
+            ctx.early_hints = [*ctx.early_hints, *links]
+        return None
+
+    def add_late_push(self, ctx: RequestContext, message: dict) -> None:
+        """Add the link of a push sent after the response start, if not sent yet."""
+        if ctx.response_started:
+            if not self.late_push_logged:
+                self.late_push_logged = True
+                logger.debug("Push sent after the response headers dropped")
+            return
+        link = make_preload_link(message["path"], message.get("headers", ()))
+        if ctx.response_headers is not None:
+            # the start was handled by `stream_message`
+            ctx.response_headers.append(("link", link.decode("latin-1")))
+        elif ctx.start_headers is not None:
+            ctx.start_headers.append((b"link", link))
+
+    async def stream_message(
+        self,
+        ctx: RequestContext,
+        protocol: Union["RSGIHTTPProtocol", "RSGIWebsocketProtocol"],
+        message: dict,
+    ) -> None:
+        """
+        Forward a single ASGI send message to the rsgi `protocol` as soon as it arrives.
+
+        `http.response.start` is held until the first body message, so a response
+        with a single body message is still sent with `response_bytes`. Otherwise
+        a stream is opened and every chunk is awaited on the transport, which
+        gives the app backpressure from the client.
+
+        Args:
+            ctx (RequestContext): State of the current request.
+            protocol (RSGIHTTPProtocol): RSGIHTTPProtocol instance.
+            message (dict): ASGI message sent by the app.
+        """
+        msg_type = message["type"]
+        if msg_type == EventTypeEnum.HTTP_RESP_START:
+            ctx.response_status = message["status"]
+            ctx.response_headers = self.make_rsgi_headers(message["headers"])
+            ctx.response_content_length = get_response_content_length(
+                ctx.response_headers
+            )
+        elif msg_type == EventTypeEnum.HTTP_RESP_BODY:
+            if ctx.response_status is None:
+                return
+            body = message.get("body", b"")
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+            if ctx.presized is not None:
+                ctx.presized.append(body)
+                ctx.presized_size += len(body)
+                more_body = message.get("more_body", False)
+                if not more_body or ctx.presized_size > ctx.response_content_length:
+                    await self.flush_presized(ctx, protocol)
+                return
+            if ctx.transport is None:
+                if ctx.response_started:
+                    return
+                ctx.response_started = True
+                encoding = None
+                if self.compression is not None and ctx.scope is not None:
+                    encoding = self.compression.negotiate(
+                        ctx.scope.method,
+                        ctx.scope.headers,
+                        ctx.response_status,
+                        ctx.response_headers,
+                    )
+                if not message.get("more_body", False):
+                    if encoding and len(body) >= self.compression.minimum_size:
+                        body = self.compression.compress(encoding, (body,))
+                        ctx.response_headers = encoded_headers(
+                            ctx.response_headers, encoding, len(body)
+                        )
+                    if body:
+                        protocol.response_bytes(
+                            status=ctx.response_status,
+                            headers=ctx.response_headers,
+                            body=body,
+                        )
+                    else:
+                        protocol.response_empty(
+                            status=ctx.response_status, headers=ctx.response_headers
+                        )
+                    return
+                if encoding:
+                    ctx.compressor = self.compression.compressor(encoding)
+                    ctx.response_headers = encoded_headers(
+                        ctx.response_headers, encoding, None
+                    )
+                elif self.can_presize(ctx.response_content_length):
+                    # hold the chunks, the response is sent as a single body
+                    ctx.presized = [body]
+                    ctx.presized_size = len(body)
+                    return
+                self.open_stream(ctx, protocol)
+            if ctx.compressor is not None:
+                body = ctx.compressor.compress(body) if body else b""
+                if not message.get("more_body", False):
+                    body += ctx.compressor.finish()
+                    ctx.compressor = None
+            if body:
+                await ctx.transport.send_bytes(body)
+        elif msg_type == EventTypeEnum.PATH_SEND:
+            if ctx.response_status is None or ctx.response_started:
+                return
+            ctx.response_started = True
+            self.send_file(
+                protocol,
+                ctx.response_status,
+                ctx.response_headers,
+                message["path"],
+                ctx.scope,
+            )
+
+    def can_presize(self, content_length: Optional[int]) -> bool:
+        """Whether a response of `content_length` bytes can be held in memory."""
+        return (
+            content_length is not None
+            and self.presize_threshold is not None
+            and content_length <= self.presize_threshold
+            and (
+                self.send_high_watermark is None
+                or content_length <= self.send_high_watermark
+            )
+        )
+
+    def open_stream(
+        self,
+        ctx: RequestContext,
+        protocol: "RSGIHTTPProtocol",
+    ) -> None:
+        ctx.transport = protocol.response_stream(
+            status=ctx.response_status, headers=ctx.response_headers
+        )
+        if self.send_high_watermark is not None:
+            ctx.transport = WatermarkTransport(
+                ctx.transport,
+                self.send_high_watermark,
+                self.send_low_watermark,
+            )
+
+    async def flush_presized(
+        self,
+        ctx: RequestContext,
+        protocol: "RSGIHTTPProtocol",
+    ) -> None:
+        """
+        Send the chunks held for a pre-sized response, with a single `response_bytes`
+        call if they have the declared length, streamed otherwise.
+        """
+        chunks, ctx.presized = ctx.presized, None
+        if ctx.presized_size == ctx.response_content_length:
+            protocol.response_bytes(
+                status=ctx.response_status,
+                headers=ctx.response_headers,
+                body=b"".join(chunks),
+            )
+            return
+        self.open_stream(ctx, protocol)
+        for chunk in chunks:
+            if chunk:
+                await ctx.transport.send_bytes(chunk)
+
+    def send_file(
+        self,
+        protocol: "RSGIHTTPProtocol",
+        status: int,
+        headers: list,
+        path: Union[str, PathLike],
+        scope: Optional["RSGIHTTPScope"] = None,
+    ) -> None:
+        """
+        Send a file with `response_file`, the file is never read in Python.
+
+        When the rsgi request `scope` is given, `If-None-Match` / `If-Modified-Since`
+        requests get an empty 304 response, and a single `Range` is sent as a 206
+        response with `response_file_range` when the transport supports it. With
+        compression enabled, a precompressed sibling of the file is sent instead
+        when the client accepts its encoding.
+        """
+        if scope is not None:
+            if self.compression is not None:
+                precompressed = self.compression.find_precompressed(
+                    scope.headers, status, headers, path
+                )
+                if precompressed is not None:
+                    path, encoding, size = precompressed
+                    headers = encoded_headers(headers, encoding, size)
+            status, headers, file_range = prepare_file_response(
+                scope.method,
+                scope.headers,
+                status,
+                headers,
+                path,
+                ranges=hasattr(protocol, "response_file_range"),
+            )
+            if status in (304, 416):
+                protocol.response_empty(status=status, headers=headers)
+                return
+            if file_range is not None:
+                protocol.response_file_range(
+                    status=status,
+                    headers=headers,
+                    file=path,
+                    start=file_range[0],
+                    end=file_range[1],
+                )
+                return
+        protocol.response_file(status=status, headers=headers, file=path)
+
+    async def finish_stream(
+        self,
+        ctx: RequestContext,
+        protocol: Union["RSGIHTTPProtocol", "RSGIWebsocketProtocol"],
+    ) -> None:
+        """
+        Wait for the queued chunks to be written, and send an empty response if
+        the app started a response but never sent a body.
+        """
+        if ctx.presized is not None:
+            await self.flush_presized(ctx, protocol)
+        if ctx.compressor is not None:
+            # the app ended the stream without a final body message
+            compressor, ctx.compressor = ctx.compressor, None
+            await ctx.transport.send_bytes(compressor.finish())
+        if isinstance(ctx.transport, WatermarkTransport):
+            await ctx.transport.close()
+        if ctx.response_status is not None and not ctx.response_started:
+            ctx.response_started = True
+            protocol.response_empty(
+                status=ctx.response_status, headers=ctx.response_headers
+            )
+
+    def request_encoding(self, scope: "RSGIHTTPScope") -> Optional[str]:
+        """The encoding a response to the request is compressed with, if any."""
+        if self.compression is None:
+            return None
+        return self.compression.select_encoding(
+            scope.headers, self.compression.encodings
+        )
 
-        await self.perform_response(protocol, response)
+    def cache_response(self, key: tuple, response: Response, max_age: float) -> None:
+        """Store a buffered response in the cache, as it is sent."""
+        if response.path is not None:
+            return
+        if response.size > self.cache.max_entry_size:
+            return
+        self.cache.store(
+            key, response.status, response.headers, response.join_body(), max_age
+        )
+
+    def share_response(
+        self, flight: Tuple[tuple, asyncio.Future], response: Response
+    ) -> None:
+        """Give a buffered response to the identical requests waiting for it."""
+        entry = None
+        if response.path is None and self.single_flight.shareable(
+            response.status, response.headers
+        ):
+            entry = CacheEntry(
+                response.status, response.headers, response.join_body(), 0
+            )
+        self.single_flight.finish(*flight, entry)
+
+    def send_cached(
+        self,
+        protocol: "RSGIHTTPProtocol",
+        entry: CacheEntry,
+        scope: "RSGIHTTPScope",
+        age: bool = True,
+    ) -> None:
+        """
+        Answer a request with a cached response, the app is not called. The entry
+        is already encoded for the request, it is sent as it is.
+        """
+        headers = entry.headers
+        if age:
+            headers = headers + [("age", str(entry.age))]
+        if scope.method == "HEAD" or not entry.body:
+            protocol.response_empty(status=entry.status, headers=headers)
+            return
+        protocol.response_bytes(status=entry.status, headers=headers, body=entry.body)
 
     async def get_response(self, send_queue: asyncio.Queue):
         response = Response(
             status=None,
             headers=[],
-            body=BodyManager(),
+            body=None,
             path=None,
             stream=None,
             type=None,
+            spill_threshold=self.body_spill_threshold,
+            chunk_size=self.response_chunk_size,
         )
         while not send_queue.empty():
             message = await send_queue.get()
             if message["type"] == EventTypeEnum.HTTP_RESP_START:
                 response.status = message["status"]
-                response.headers = [
-                    (k.decode(), v.decode()) for k, v in message["headers"]
-                ]
+                response.headers = self.make_rsgi_headers(message["headers"])
             elif message["type"] == EventTypeEnum.HTTP_RESP_BODY:
-                response.body.append(message["body"])
+                response.append(message.get("body", b""))
             elif message["type"] == EventTypeEnum.PATH_SEND:
                 response.path = message["path"]
                 response.type = EventTypeEnum.PATH_SEND
         return response
 
+    def is_presized(self, response: Response) -> bool:
+        """
+        Whether a buffered body has the declared `Content-Length` and is small enough
+        to be sent as a single body.
+        """
+        content_length = get_response_content_length(response.headers)
+        return self.can_presize(content_length) and content_length == response.size
+
     async def perform_response(
         self,
         protocol: Union["RSGIHTTPProtocol", "RSGIWebsocketProtocol"],
         response: Response,
+        scope: Optional["RSGIHTTPScope"] = None,
     ) -> None:
         if not response.status:
             return
         if response.path is not None and isinstance(response.path, (str, PathLike)):
-            protocol.response_file(
-                status=response.status, headers=response.headers, file=response.path
+            self.send_file(
+                protocol, response.status, response.headers, response.path, scope
             )
-        elif len(response.body) == 0:
+        elif response.content is not None:
+            if response.content:
+                protocol.response_bytes(
+                    status=response.status,
+                    headers=response.headers,
+                    body=response.content,
+                )
+            else:
+                protocol.response_empty(
+                    status=response.status, headers=response.headers
+                )
+        elif response.body is None or len(response.body) == 0:
             protocol.response_empty(status=response.status, headers=response.headers)
-        elif len(response.body) == 1:
+        elif len(response.body) == 1 or self.is_presized(response):
             protocol.response_bytes(
                 status=response.status,
                 headers=response.headers,
@@ -257,3 +1378,35 @@ class ASGIToRSGIAdapter:
             async for chunk in response.body:
                 await trx.send_bytes(chunk)
         response.clear_body()
+
+    async def compress_response(
+        self, response: Response, scope: "RSGIHTTPScope"
+    ) -> None:
+        """
+        Replace the buffered body of `response` with its compressed form. Large
+        bodies are compressed in a worker thread, spilled bodies stay on disk.
+        """
+        size = response.size
+        if size == 0 or size < self.compression.minimum_size:
+            return
+        maximum_size = self.compression.maximum_size
+        if maximum_size is not None and size > maximum_size:
+            return
+        if response.body is not None and response.body.spilled:
+            return
+        encoding = self.compression.negotiate(
+            scope.method, scope.headers, response.status, response.headers
+        )
+        if encoding is None:
+            return
+        chunks = (response.content,) if response.content is not None else response.body
+        if size >= THREAD_COMPRESS_SIZE:
+            content = await asyncio.to_thread(
+                self.compression.compress, encoding, chunks
+            )
+        else:
+            content = self.compression.compress(encoding, chunks)
+        response.clear_body()
+        response.body = None
+        response.content = content
+        response.headers = encoded_headers(response.headers, encoding, len(content))
@@ -0,0 +1,186 @@
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Mapping, Optional, Tuple
+
+# Methods answered from the cache, HEAD requests get the headers of the GET response
+CACHED_METHODS = frozenset(("GET", "HEAD"))
+# Request headers that make a response private to the client
+PRIVATE_REQUEST_HEADERS = ("authorization", "cookie")
+# Cache-Control directives of the response that forbid caching it
+UNCACHEABLE_DIRECTIVES = frozenset(("no-store", "no-cache", "private"))
+# Response headers never stored in the cache
+UNCACHED_HEADERS = frozenset(("age", "date"))
+
+
+def request_authority(scope) -> Optional[str]:
+    """The authority of an rsgi request scope, the `Host` header over HTTP/1."""
+    return scope.authority or scope.headers.get("host")
+
+
+def parse_cache_control(value: Optional[str]) -> Mapping[str, Optional[str]]:
+    directives = {}
+    if not value:
+        return directives
+    for item in value.split(","):
+        name, _, argument = item.partition("=")
+        name = name.strip().lower()
+        if name:
+            directives[name] = argument.strip().strip('"') or None
+    return directives
+
+
+class CacheEntry:
+    """A cached response."""
+
+    __slots__ = ("status", "headers", "body", "created", "expires", "size")
+
+    def __init__(
+        self,
+        status: int,
+        headers: List[Tuple[str, str]],
+        body: bytes,
+        max_age: float,
+    ):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.created = time.monotonic()
+        self.expires = self.created + max_age
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers)
+
+    @property
+    def age(self) -> int:
+        return int(time.monotonic() - self.created)
+
+
+class ResponseCache:
+    """
+    In-process cache of buffered `GET` responses, shared by every request of a
+    worker.
+
+    Responses are keyed on the scheme, the authority, the path, the query string,
+    the request headers named in `vary` and the encoding the adapter compresses
+    them with. They are stored as they are sent, already compressed, and hits are
+    sent as they are. Only `200` responses are stored, for the `max-age` (or
+    `s-maxage`) of their `Cache-Control` header, or `default_max_age` seconds when
+    they have none. Responses with `no-store`, `no-cache`, `private`, `Set-Cookie`,
+    or a `Vary` header naming a request header not in `vary` are not stored, and
+    requests with `Authorization` or `Cookie` headers always reach the app. The
+    least recently used responses are evicted once the cache holds more than
+    `max_size` bytes.
+
+    Args:
+        max_size: Total size in bytes of the cached responses.
+        vary: Request header names the responses vary on.
+        default_max_age: Seconds a response without `max-age` is cached, None to
+            only cache responses with `max-age`.
+        max_entry_size: Size in bytes of the largest cached body, a tenth of
+            `max_size` by default.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 16 * 1024 * 1024,
+        vary: Iterable[str] = (),
+        default_max_age: Optional[float] = None,
+        max_entry_size: Optional[int] = None,
+    ):
+        self.max_size = max_size
+        self.vary = tuple(name.lower() for name in vary)
+        self.default_max_age = default_max_age
+        self.max_entry_size = (
+            max_size // 10 if max_entry_size is None else max_entry_size
+        )
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, CacheEntry]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, scope, encoding: Optional[str] = None) -> Optional[tuple]:
+        """
+        The cache key of an rsgi request scope, None if it is not cacheable.
+        `encoding` is the content encoding negotiated for the request.
+        """
+        if scope.method not in CACHED_METHODS:
+            return None
+        headers = scope.headers
+        if any(name in headers for name in PRIVATE_REQUEST_HEADERS):
+            return None
+        return (
+            scope.scheme,
+            request_authority(scope),
+            scope.path,
+            scope.query_string,
+            tuple(headers.get(name) for name in self.vary),
+            encoding,
+        )
+
+    def get(self, key: tuple) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires <= time.monotonic():
+            self.remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def max_age(self, status: int, headers: List[Tuple[str, str]]) -> Optional[float]:
+        """Seconds the response can be cached, None if it must not be cached."""
+        if status != 200:
+            return None
+        cache_control = None
+        for key, value in headers:
+            name = key.lower()
+            if name == "cache-control":
+                cache_control = value
+            elif name == "set-cookie":
+                return None
+            elif name == "vary":
+                varied = (item.strip().lower() for item in value.split(","))
+                if any(item not in self.vary for item in varied if item):
+                    return None
+        directives = parse_cache_control(cache_control)
+        if UNCACHEABLE_DIRECTIVES.intersection(directives):
+            return None
+        max_age = directives.get("s-maxage") or directives.get("max-age")
+        if max_age is None:
+            return self.default_max_age
+        try:
+            max_age = float(max_age)
+        except ValueError:
+            return None
+        return max_age if max_age > 0 else None
+
+    def store(
+        self,
+        key: tuple,
+        status: int,
+        headers: List[Tuple[str, str]],
+        body: bytes,
+        max_age: float,
+    ) -> None:
+        if len(body) > self.max_entry_size:
+            return
+        headers = [(k, v) for k, v in headers if k.lower() not in UNCACHED_HEADERS]
+        entry = CacheEntry(status, headers, body, max_age)
+        self.remove(key)
+        self._entries[key] = entry
+        self.size += entry.size
+        while self.size > self.max_size:
+            self.remove(next(iter(self._entries)))
+
+    def remove(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
@@ -0,0 +1,76 @@
+import asyncio
+from typing import Dict, Iterable, Optional
+
+from rsgiadapter.cache import PRIVATE_REQUEST_HEADERS, CacheEntry, request_authority
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent `GET` requests, so the app runs once for all of
+    them.
+
+    While a request to one of `paths` is handled, identical requests wait for it
+    and are answered with a copy of its buffered response, as it was sent. Requests
+    are identical when they have the same scheme, authority, path, query string,
+    values of the request headers named in `vary` and negotiated content encoding.
+    Requests with `Authorization` or `Cookie` headers are never coalesced, neither
+    are responses with `Set-Cookie`, streamed or sent from a file: waiting requests
+    then run the app themselves, as soon as the response starts streaming. Not
+    available with `streaming=True`, where every response is streamed.
+
+    Args:
+        paths: Path prefixes of the coalesced routes.
+        vary: Request header names the responses vary on.
+    """
+
+    def __init__(self, paths: Iterable[str], vary: Iterable[str] = ()):
+        self.paths = tuple(paths)
+        self.vary = tuple(name.lower() for name in vary)
+        self.in_flight: Dict[tuple, asyncio.Future] = {}
+        self.coalesced = 0
+
+    def key(self, scope, encoding: Optional[str] = None) -> Optional[tuple]:
+        """
+        The key of an rsgi request scope, None if it is not coalesced. `encoding` is
+        the content encoding negotiated for the request.
+        """
+        if scope.method != "GET" or not scope.path.startswith(self.paths):
+            return None
+        headers = scope.headers
+        if any(name in headers for name in PRIVATE_REQUEST_HEADERS):
+            return None
+        return (
+            scope.scheme,
+            request_authority(scope),
+            scope.path,
+            scope.query_string,
+            tuple(headers.get(name) for name in self.vary),
+            encoding,
+        )
+
+    def leader(self, key: tuple) -> Optional[asyncio.Future]:
+        """The response future of the identical request in flight, if any."""
+        return self.in_flight.get(key)
+
+    def start(self, key: tuple) -> asyncio.Future:
+        """Start the flight of `key`, its future is given back to `finish`."""
+        future = self.in_flight[key] = asyncio.get_running_loop().create_future()
+        return future
+
+    def finish(
+        self, key: tuple, future: asyncio.Future, entry: Optional[CacheEntry] = None
+    ) -> None:
+        """
+        Give the response to the requests waiting on `future`, None when it can't be
+        shared. A newer flight started for `key` meanwhile is left running.
+        """
+        if self.in_flight.get(key) is future:
+            del self.in_flight[key]
+        if not future.done():
+            future.set_result(entry)
+
+    @staticmethod
+    def shareable(status: Optional[int], headers) -> bool:
+        if not status:
+            return False
+        return not any(key.lower() == "set-cookie" for key, _ in headers)
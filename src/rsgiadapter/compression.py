@@ -0,0 +1,288 @@
+import os
+import zlib
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+DEFAULT_MINIMUM_SIZE = 500
+# Largest buffered body compressed, larger ones are sent as they are
+DEFAULT_MAXIMUM_SIZE = 8 * 1024 * 1024
+# Buffered bodies from this size are compressed in a worker thread
+THREAD_COMPRESS_SIZE = 256 * 1024
+# Bytes of a streamed body compressed between two flushes to the client
+DEFAULT_FLUSH_SIZE = 16 * 1024
+DEFAULT_CONTENT_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/x-javascript",
+    "image/svg+xml",
+)
+# Statuses whose body must not be encoded
+SKIPPED_STATUSES = frozenset((204, 206, 304))
+# Content types whose chunks must reach the client right away
+SKIPPED_CONTENT_TYPES = ("text/event-stream",)
+# File suffix of precompressed siblings of a file sent with pathsend
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "zstd": ".zst", "gzip": ".gz"}
+
+
+class StreamCompressor:
+    """
+    Incremental compressor. The output is flushed, so the client can decode
+    everything sent so far, once `flush_size` bytes were compressed since the last
+    flush: flushing every small chunk would restart the compression and hurt the
+    ratio.
+    """
+
+    __slots__ = ("_compress", "_flush", "_finish", "flush_size", "_pending")
+
+    def __init__(
+        self,
+        compress: Callable[[bytes], bytes],
+        flush: Callable[[], bytes],
+        finish: Callable[[], bytes],
+        flush_size: int = DEFAULT_FLUSH_SIZE,
+    ):
+        self._compress = compress
+        self._flush = flush
+        self._finish = finish
+        self.flush_size = flush_size
+        self._pending = 0
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        self._pending += len(data)
+        data = self._compress(data)
+        if flush and self._pending >= self.flush_size:
+            self._pending = 0
+            return data + self._flush()
+        return data
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def gzip_compressor(level: int) -> StreamCompressor:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return StreamCompressor(
+        compressor.compress,
+        lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush,
+    )
+
+
+def brotli_compressor(level: int) -> StreamCompressor:
+    compressor = brotli.Compressor(quality=level)
+    return StreamCompressor(compressor.process, compressor.flush, compressor.finish)
+
+
+def zstd_compressor(level: int) -> StreamCompressor:
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return StreamCompressor(
+        compressor.compress,
+        lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+        compressor.flush,
+    )
+
+
+def available_encodings() -> Dict[str, Tuple[Callable[[int], StreamCompressor], int]]:
+    """Encodings supported in this environment, by server preference."""
+    encodings = {}
+    if brotli is not None:
+        encodings["br"] = (brotli_compressor, 4)
+    if zstandard is not None:
+        encodings["zstd"] = (zstd_compressor, 3)
+    encodings["gzip"] = (gzip_compressor, 6)
+    return encodings
+
+
+def parse_accept_encoding(value: Optional[str]) -> Dict[str, float]:
+    accepted = {}
+    if not value:
+        return accepted
+    for item in value.split(","):
+        encoding, _, params = item.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[encoding.strip().lower()] = quality
+    return accepted
+
+
+class Compression:
+    """
+    Response compression applied by the adapter.
+
+    Bodies are encoded with the first encoding of `encodings` the client accepts,
+    brotli and zstd are used when the `brotli` and `zstandard` packages are installed.
+    Responses already encoded, smaller than `minimum_size`, or with a content type
+    not starting with one of `content_types` are sent as they are. Files sent with
+    `http.response.pathsend` are replaced with a precompressed sibling
+    (`style.css.br`, `style.css.gz`) when there is one, and are never compressed in
+    Python. Buffered bodies larger than `maximum_size`, or spilled to disk, are sent
+    as they are, and bodies from 256 KiB are compressed in a worker thread so the
+    worker loop keeps serving. Streamed bodies are flushed to the client every
+    `flush_size` bytes, and `text/event-stream` responses, whose events can't wait,
+    are never compressed.
+
+    Args:
+        minimum_size: Minimum body size in bytes to compress.
+        maximum_size: Maximum buffered body size in bytes to compress, None for no
+            limit.
+        encodings: Allowed encodings by preference, all available ones by default.
+        content_types: Compressed content type prefixes.
+        precompressed: Whether to look for precompressed files.
+        flush_size: Bytes of a streamed body compressed between two flushes.
+    """
+
+    def __init__(
+        self,
+        minimum_size: int = DEFAULT_MINIMUM_SIZE,
+        maximum_size: Optional[int] = DEFAULT_MAXIMUM_SIZE,
+        encodings: Optional[Iterable[str]] = None,
+        content_types: Iterable[str] = DEFAULT_CONTENT_TYPES,
+        precompressed: bool = True,
+        flush_size: int = DEFAULT_FLUSH_SIZE,
+    ):
+        available = available_encodings()
+        if encodings is None:
+            self.encodings = available
+        else:
+            self.encodings = {e: available[e] for e in encodings if e in available}
+        self.minimum_size = minimum_size
+        self.maximum_size = maximum_size
+        self.content_types = tuple(content_types)
+        self.precompressed = precompressed
+        self.flush_size = flush_size
+
+    def select_encoding(
+        self, request_headers: Optional[Mapping[str, str]], encodings: Iterable[str]
+    ) -> Optional[str]:
+        if not request_headers:
+            return None
+        accepted = parse_accept_encoding(request_headers.get("accept-encoding"))
+        if not accepted:
+            return None
+        default = accepted.get("*", 0.0)
+        for encoding in encodings:
+            if accepted.get(encoding, default) > 0:
+                return encoding
+        return None
+
+    def negotiate(
+        self,
+        method: str,
+        request_headers: Optional[Mapping[str, str]],
+        status: int,
+        headers: List[Tuple[str, str]],
+    ) -> Optional[str]:
+        """
+        The encoding to compress the response with, None to send it as it is.
+        """
+        if method == "HEAD" or status in SKIPPED_STATUSES or status < 200:
+            return None
+        content_type = None
+        for key, value in headers:
+            key = key.lower()
+            if key == "content-encoding":
+                return None
+            if key == "content-type":
+                content_type = value.lower()
+            elif key == "content-length":
+                try:
+                    if int(value) < self.minimum_size:
+                        return None
+                except ValueError:
+                    return None
+        if content_type is None or not content_type.startswith(self.content_types):
+            return None
+        if content_type.startswith(SKIPPED_CONTENT_TYPES):
+            return None
+        return self.select_encoding(request_headers, self.encodings)
+
+    def compressor(self, encoding: str) -> StreamCompressor:
+        factory, level = self.encodings[encoding]
+        compressor = factory(level)
+        compressor.flush_size = self.flush_size
+        return compressor
+
+    def compress(self, encoding: str, chunks: Iterable[bytes]) -> bytes:
+        compressor = self.compressor(encoding)
+        data = [compressor.compress(chunk, flush=False) for chunk in chunks]
+        data.append(compressor.finish())
+        return b"".join(data)
+
+    def find_precompressed(
+        self,
+        request_headers: Optional[Mapping[str, str]],
+        status: int,
+        headers: List[Tuple[str, str]],
+        path: Union[str, os.PathLike],
+    ) -> Optional[Tuple[str, str, int]]:
+        """
+        A precompressed sibling of `path` the client accepts, as
+        `(path, encoding, size)`. Range requests always get the original file.
+        """
+        if not self.precompressed or not request_headers:
+            return None
+        if status != 200 or "range" in request_headers:
+            return None
+        if any(key.lower() == "content-encoding" for key, _ in headers):
+            return None
+        accepted = parse_accept_encoding(request_headers.get("accept-encoding"))
+        if not accepted:
+            return None
+        default = accepted.get("*", 0.0)
+        path = os.fspath(path)
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+            if accepted.get(encoding, default) <= 0:
+                continue
+            try:
+                stat = os.stat(path + suffix)
+            except OSError:
+                continue
+            return path + suffix, encoding, stat.st_size
+        return None
+
+
+def encoded_headers(
+    headers: List[Tuple[str, str]], encoding: str, content_length: Optional[int]
+) -> List[Tuple[str, str]]:
+    """
+    Response headers for a body encoded with `encoding`, `content_length` is the
+    encoded size, or None when unknown.
+    """
+    result = []
+    vary = []
+    for key, value in headers:
+        name = key.lower()
+        if name == "etag":
+            # the encoded body is a different representation
+            result.append((key, value if value.startswith("W/") else "W/" + value))
+            continue
+        if name in ("content-length", "accept-ranges"):
+            continue
+        if name == "vary":
+            vary.extend(item.strip() for item in value.split(",") if item.strip())
+            continue
+        result.append((key, value))
+    result.append(("content-encoding", encoding))
+    varied = [item.lower() for item in vary]
+    if "accept-encoding" not in varied and "*" not in varied:
+        vary.append("accept-encoding")
+    result.append(("vary", ", ".join(vary)))
+    if content_length is not None:
+        result.append(("content-length", str(content_length)))
+    return result
@@ -1,7 +1,20 @@
-from enum import StrEnum
+from enum import IntEnum, StrEnum
 
 DEFAULT_ASGI_VERSION = "3.0"
 DEFAULT_SPEC_VERSION = "2.3"
+# request bodies with a Content-Length up to this size are read in one call
+DEFAULT_BODY_READ_THRESHOLD = 64 * 1024
+# responses with a Content-Length up to this size are sent as a single body
+DEFAULT_PRESIZE_THRESHOLD = 1024 * 1024
+# number of encoded request header names kept in cache
+HEADER_NAME_CACHE_SIZE = 256
+# number of decoded response header names kept in cache
+RESPONSE_HEADER_CACHE_SIZE = 512
+
+# websocket close code used when the client closed without a status
+WEBSOCKET_CLOSE_NO_STATUS = 1005
+WEBSOCKET_CLOSE_NORMAL = 1000
+WEBSOCKET_CLOSE_INTERNAL_ERROR = 1011
 
 
 class EventTypeEnum(StrEnum):
@@ -21,6 +34,32 @@ class EventTypeEnum(StrEnum):
     WEBSOCKET_DISCONNECT = "websocket.disconnect"
     WEBSOCKET_RECEIVE = "websocket.receive"
     WEBSOCKET_SEND = "websocket.send"
+    WEBSOCKET_ACCEPT = "websocket.accept"
+    WEBSOCKET_CLOSE = "websocket.close"
 
     # extensions
     PATH_SEND = "http.response.pathsend"
+    EARLY_HINT = "http.response.early_hint"
+    PUSH = "http.response.push"
+    HTTP_RESP_TRAILERS = "http.response.trailers"
+
+
+class ResponseTypeEnum(StrEnum):
+    """
+    How a response is sent to the rsgi protocol
+    """
+
+    BYTES = "bytes"
+    EMPTY = "empty"
+    STREAM = "stream"
+    FILE = "file"
+
+
+class WebsocketMessageType(IntEnum):
+    """
+    RSGI websocket message kinds
+    """
+
+    close = 0
+    bytes = 1
+    string = 2
@@ -0,0 +1,209 @@
+import os
+from email.utils import parsedate_to_datetime
+from typing import List, Mapping, Optional, Tuple, Union
+
+# Headers kept on a 304 Not Modified response
+NOT_MODIFIED_HEADERS = frozenset(
+    (
+        "cache-control",
+        "content-location",
+        "date",
+        "etag",
+        "expires",
+        "last-modified",
+        "vary",
+    )
+)
+# Headers replaced on a 206 Partial Content or 416 Range Not Satisfiable response
+RANGE_REPLACED_HEADERS = frozenset(("content-length", "content-range", "accept-ranges"))
+
+
+def get_header(headers: List[Tuple[str, str]], name: str) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def filter_headers(
+    headers: List[Tuple[str, str]], names: frozenset, keep: bool = True
+) -> List[Tuple[str, str]]:
+    """Keep only the headers in `names`, or drop them when `keep` is False."""
+    return [(k, v) for k, v in headers if (k.lower() in names) is keep]
+
+
+def strip_etag(etag: str, weak: bool) -> Optional[str]:
+    etag = etag.strip()
+    if etag.startswith("W/"):
+        if not weak:
+            return None
+        etag = etag[2:]
+    return etag
+
+
+def etag_matches(etag: Optional[str], value: str, weak: bool = True) -> bool:
+    """
+    Compare the response `etag` with an `If-None-Match` or `If-Range` header value,
+    weak comparison is used for `If-None-Match` and strong for `If-Range`.
+    """
+    if etag is None:
+        return False
+    if value.strip() == "*":
+        return True
+    etag = strip_etag(etag, weak)
+    if etag is None:
+        return False
+    return any(strip_etag(item, weak) == etag for item in value.split(","))
+
+
+def parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class FileInfo:
+    """
+    Lazily read facts about a file, so the file is only stat'ed when a
+    conditional or range request needs it.
+    """
+
+    __slots__ = ("path", "headers", "_stat")
+
+    def __init__(self, path: Union[str, os.PathLike], headers: List[Tuple[str, str]]):
+        self.path = path
+        self.headers = headers
+        self._stat = None
+
+    @property
+    def stat(self) -> os.stat_result:
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    @property
+    def size(self) -> int:
+        return self.stat.st_size
+
+    @property
+    def etag(self) -> Optional[str]:
+        return get_header(self.headers, "etag")
+
+    @property
+    def last_modified(self) -> Optional[float]:
+        last_modified = parse_http_date(get_header(self.headers, "last-modified"))
+        if last_modified is None:
+            return int(self.stat.st_mtime)
+        return last_modified
+
+
+def is_not_modified(request_headers: Mapping[str, str], file: FileInfo) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(file.etag, if_none_match)
+    if_modified_since = parse_http_date(request_headers.get("if-modified-since"))
+    if if_modified_since is None:
+        return False
+    return file.last_modified <= if_modified_since
+
+
+def if_range_matches(value: str, file: FileInfo) -> bool:
+    value = value.strip()
+    if value.startswith('"') or value.startswith("W/"):
+        return etag_matches(file.etag, value, weak=False)
+    if_range_date = parse_http_date(value)
+    return if_range_date is not None and file.last_modified == if_range_date
+
+
+def parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `Range: bytes=...` header value into a `(start, end)` pair,
+    `end` excluded.
+
+    Returns:
+        None if the header is invalid or asks for several ranges, the full body is sent.
+
+    Raises:
+        ValueError: If the range can not be satisfied.
+    """
+    unit, _, ranges = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, sep, last = ranges.strip().partition("-")
+    first, last = first.strip(), last.strip()
+    if (
+        not sep
+        or (first and not first.isdigit())
+        or (last and not last.isdigit())
+        or not (first or last)
+    ):
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("Range Not Satisfiable")
+        return max(size - suffix, 0), size
+    start = int(first)
+    end = int(last) + 1 if last else size
+    if start >= size or start >= end:
+        raise ValueError("Range Not Satisfiable")
+    return start, min(end, size)
+
+
+def prepare_file_response(
+    method: str,
+    request_headers: Optional[Mapping[str, str]],
+    status: int,
+    headers: List[Tuple[str, str]],
+    path: Union[str, os.PathLike],
+    ranges: bool = True,
+) -> Tuple[int, List[Tuple[str, str]], Optional[Tuple[int, int]]]:
+    """
+    Apply `If-None-Match` / `If-Modified-Since` and `Range` request headers to a
+    file response, without reading the file.
+
+    Args:
+        method: The request method.
+        request_headers: The rsgi request headers.
+        status: The status sent by the app, only 200 responses are changed.
+        headers: The response headers sent by the app.
+        path: The file path.
+        ranges: Whether the transport can send a byte range of the file.
+
+    Returns:
+        The response status and headers, and the `(start, end)` byte range to send,
+        `end` excluded, or None to send the whole file. 304 and 416 responses have
+        no body.
+    """
+    if status != 200 or not request_headers or method not in ("GET", "HEAD"):
+        return status, headers, None
+    file = FileInfo(path, headers)
+    try:
+        if is_not_modified(request_headers, file):
+            return 304, filter_headers(headers, NOT_MODIFIED_HEADERS), None
+        range_header = request_headers.get("range")
+        if not ranges or method != "GET" or range_header is None:
+            return status, headers, None
+        if_range = request_headers.get("if-range")
+        if if_range is not None and not if_range_matches(if_range, file):
+            return status, headers, None
+        size = file.size
+    except OSError:
+        return status, headers, None
+    try:
+        file_range = parse_range(range_header, size)
+    except ValueError:
+        headers = filter_headers(headers, RANGE_REPLACED_HEADERS, keep=False)
+        headers.append(("content-range", f"bytes */{size}"))
+        return 416, headers, None
+    if file_range is None:
+        return status, headers, None
+    start, end = file_range
+    headers = filter_headers(headers, RANGE_REPLACED_HEADERS, keep=False)
+    headers.append(("accept-ranges", "bytes"))
+    headers.append(("content-range", f"bytes {start}-{end - 1}/{size}"))
+    headers.append(("content-length", str(end - start)))
+    return 206, headers, file_range
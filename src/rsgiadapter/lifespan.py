@@ -1,6 +1,8 @@
 import asyncio
 import logging
 
+from rsgiadapter.constant import DEFAULT_ASGI_VERSION, DEFAULT_SPEC_VERSION
+
 
 class LifespanProtocol:
     """
@@ -43,13 +45,17 @@ class LifespanProtocol:
         self.failure_shutdown = False
         self.exc = None
         self.state = {}
+        self._handler_task = None
 
     async def handle(self):
         try:
             await self._callable(
                 {
                     "type": "lifespan",
-                    "asgi": {"version": "3.0", "spec_version": "2.3"},
+                    "asgi": {
+                        "version": DEFAULT_ASGI_VERSION,
+                        "spec_version": DEFAULT_SPEC_VERSION,
+                    },
                     "state": self.state,
                 },
                 self.receive,
@@ -67,29 +73,27 @@ class LifespanProtocol:
             self.event_shutdown.set()
 
     async def startup(self):
-        loop = asyncio.get_event_loop()
-        _handler_task = loop.create_task(self.handle())
+        loop = asyncio.get_running_loop()
+        # The app keeps running in this task until the shutdown event is received
+        self._handler_task = loop.create_task(self.handle())
 
         await self.event_queue.put({"type": "lifespan.startup"})
         await self.event_startup.wait()
 
         if self.errored:
-            _handler_task.cancel()
+            self._handler_task.cancel()
 
     async def shutdown(self):
-        print("in lifespanprotocol shutdown")
-        self.state.clear()
-
-        if self.errored:
+        if self.errored or self._handler_task is None:
+            self.state.clear()
             return
-        loop = asyncio.get_event_loop()
-        _handler_task = loop.create_task(self.handle())
 
         await self.event_queue.put({"type": "lifespan.shutdown"})
         await self.event_shutdown.wait()
 
         if self.errored:
-            _handler_task.cancel()
+            self._handler_task.cancel()
+        self.state.clear()
 
     async def receive(self):
         return await self.event_queue.get()
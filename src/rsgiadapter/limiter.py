@@ -0,0 +1,86 @@
+import asyncio
+from collections import deque
+from typing import Deque, Optional
+
+
+class ConcurrencyLimiter:
+    """
+    Limit the number of HTTP requests handled at once by a worker.
+
+    Requests over `max_concurrency` wait in a FIFO queue of at most `max_queue`
+    requests, for at most `queue_timeout` seconds. Requests that find the queue
+    full, or time out, are shed with an empty `503` response and a `Retry-After`
+    header, so the requests already admitted keep their latency under overload.
+
+    Args:
+        max_concurrency: Number of requests handled at once.
+        max_queue: Number of requests waiting for a slot, `max_concurrency` by
+            default, 0 to shed every request over the limit.
+        queue_timeout: Seconds a request waits for a slot, None to wait until one
+            is free.
+        retry_after: Seconds sent in the `Retry-After` header of shed requests.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        retry_after: int = 1,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_concurrency if max_queue is None else max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.shed = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def shed_headers(self) -> list:
+        return [("retry-after", str(self.retry_after)), ("connection", "close")]
+
+    async def acquire(self) -> bool:
+        """Wait for a free slot, False if the request must be shed."""
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # a released slot is handed over to the waiter, in_flight is unchanged
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.shed += 1
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+        return True
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
@@ -0,0 +1,165 @@
+import time
+from typing import Optional
+
+from rsgiadapter.constant import ResponseTypeEnum
+
+
+class RequestMetrics:
+    """
+    Timings and sizes of a single request handled by the adapter, given to the
+    `metrics_callback` of `ASGIToRSGI` once the response is sent.
+
+    Attributes:
+        method: Request method.
+        path: Request path.
+        status: Response status sent to the client, None if no response was sent.
+        response_type: How the response was sent, one of `ResponseTypeEnum`.
+        scope_ns: Time spent building the ASGI scope.
+        app_ns: Time spent running the ASGI app, including streamed writes.
+        buffer_ns: Time spent collecting the buffered response.
+        response_ns: Time spent sending the response to the rsgi protocol.
+        total_ns: Time spent in the adapter for the request.
+        bytes_in: Request body size.
+        chunks_in: Number of request body chunks read.
+        bytes_out: Response body size, 0 for file responses.
+        chunks_out: Number of response body chunks written.
+        disconnected: Whether the client disconnected before the response was complete.
+    """
+
+    __slots__ = (
+        "method",
+        "path",
+        "status",
+        "response_type",
+        "scope_ns",
+        "app_ns",
+        "buffer_ns",
+        "response_ns",
+        "total_ns",
+        "bytes_in",
+        "chunks_in",
+        "bytes_out",
+        "chunks_out",
+        "disconnected",
+        "_start",
+        "_last",
+    )
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.status: Optional[int] = None
+        self.response_type: Optional[str] = None
+        self.scope_ns = 0
+        self.app_ns = 0
+        self.buffer_ns = 0
+        self.response_ns = 0
+        self.total_ns = 0
+        self.bytes_in = 0
+        self.chunks_in = 0
+        self.bytes_out = 0
+        self.chunks_out = 0
+        self.disconnected = False
+        self._start = self._last = time.perf_counter_ns()
+
+    def mark(self, phase: str):
+        """Record the time since the previous mark as `<phase>_ns`."""
+        now = time.perf_counter_ns()
+        setattr(self, f"{phase}_ns", now - self._last)
+        self._last = now
+
+    def finish(self):
+        self.total_ns = time.perf_counter_ns() - self._start
+
+    def __repr__(self):
+        return (
+            f"<RequestMetrics {self.method} {self.path} {self.status} "
+            f"{self.response_type} total={self.total_ns}ns>"
+        )
+
+
+class MetricsTransport:
+    """Rsgi stream transport wrapper counting the written chunks."""
+
+    __slots__ = ("transport", "metrics")
+
+    def __init__(self, transport, metrics: RequestMetrics):
+        self.transport = transport
+        self.metrics = metrics
+
+    async def send_bytes(self, data: bytes):
+        self.metrics.bytes_out += len(data)
+        self.metrics.chunks_out += 1
+        await self.transport.send_bytes(data)
+
+    async def send_str(self, data: str):
+        self.metrics.bytes_out += len(data)
+        self.metrics.chunks_out += 1
+        await self.transport.send_str(data)
+
+
+class MetricsProtocol:
+    """
+    Rsgi HTTP protocol wrapper recording the request body read and the response
+    sent into `metrics`. Only used when metrics are enabled.
+    """
+
+    __slots__ = ("protocol", "metrics", "_body")
+
+    def __init__(self, protocol, metrics: RequestMetrics):
+        self.protocol = protocol
+        self.metrics = metrics
+        self._body = None
+
+    def __getattr__(self, name):
+        attr = getattr(self.protocol, name)
+        if name == "response_file_range":
+
+            def response_file_range(status, headers, file, start, end):
+                self.metrics.status = status
+                self.metrics.response_type = ResponseTypeEnum.FILE
+                attr(status=status, headers=headers, file=file, start=start, end=end)
+
+            return response_file_range
+        return attr
+
+    async def __call__(self):
+        body = await self.protocol()
+        self.metrics.bytes_in += len(body)
+        self.metrics.chunks_in += 1
+        return body
+
+    def __aiter__(self):
+        self._body = self.protocol.__aiter__()
+        return self
+
+    async def __anext__(self):
+        chunk = await self._body.__anext__()
+        self.metrics.bytes_in += len(chunk)
+        self.metrics.chunks_in += 1
+        return chunk
+
+    def response_empty(self, status, headers):
+        self.metrics.status = status
+        self.metrics.response_type = ResponseTypeEnum.EMPTY
+        self.protocol.response_empty(status=status, headers=headers)
+
+    def response_bytes(self, status, headers, body):
+        self.metrics.status = status
+        self.metrics.response_type = ResponseTypeEnum.BYTES
+        self.metrics.bytes_out += len(body)
+        self.metrics.chunks_out += 1
+        self.protocol.response_bytes(status=status, headers=headers, body=body)
+
+    def response_file(self, status, headers, file):
+        self.metrics.status = status
+        self.metrics.response_type = ResponseTypeEnum.FILE
+        self.protocol.response_file(status=status, headers=headers, file=file)
+
+    def response_stream(self, status, headers):
+        self.metrics.status = status
+        self.metrics.response_type = ResponseTypeEnum.STREAM
+        return MetricsTransport(
+            self.protocol.response_stream(status=status, headers=headers),
+            self.metrics,
+        )
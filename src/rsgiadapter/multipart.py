@@ -0,0 +1,263 @@
+import os
+import re
+import tempfile
+from typing import IO, Dict, Iterable, List, Optional, Tuple
+
+# Scope extension holding the parsed multipart body
+MULTIPART_EXTENSION = "rsgiadapter.multipart"
+# Maximum size of the headers of a part
+MAX_PART_HEADERS_SIZE = 16 * 1024
+DEFAULT_MAX_FIELD_SIZE = 1024 * 1024
+# Body bytes gathered before being parsed and written in a worker thread
+FEED_BUFFER_SIZE = 256 * 1024
+# RFC 2046 boundary, 1 to 70 bchars not ending with a space
+BOUNDARY_RE = re.compile(r"[0-9A-Za-z'()+_,\-./:=? ]{0,69}[0-9A-Za-z'()+_,\-./:=?]")
+
+
+class MultipartError(ValueError):
+    """The request body is not a valid multipart/form-data body."""
+
+
+def parse_header_params(value: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Split a `Content-Type` or `Content-Disposition` header value into its main value
+    and its `key=value` parameters, quoted values are unquoted.
+    """
+    items = []
+    item = []
+    quoted = False
+    for char in value:
+        if char == '"':
+            quoted = not quoted
+        elif char == ";" and not quoted:
+            items.append("".join(item))
+            item = []
+            continue
+        item.append(char)
+    items.append("".join(item))
+    params = {}
+    for param in items[1:]:
+        key, _, param_value = param.strip().partition("=")
+        param_value = param_value.strip()
+        if len(param_value) >= 2 and param_value[0] == param_value[-1] == '"':
+            param_value = param_value[1:-1].replace('\\"', '"')
+        params[key.strip().lower()] = param_value
+    return items[0].strip().lower(), params
+
+
+class MultipartParser:
+    """
+    Incremental `multipart/form-data` parser. File parts are written to temporary
+    files as the body is fed, other fields are kept in memory.
+
+    Args:
+        boundary: The multipart boundary, from the request `Content-Type`.
+        directory: Directory of the temporary files, the system default if None.
+        max_field_size: Maximum size in bytes of a field which is not a file.
+    """
+
+    def __init__(
+        self,
+        boundary: bytes,
+        directory: Optional[str] = None,
+        max_field_size: int = DEFAULT_MAX_FIELD_SIZE,
+    ):
+        self.delimiter = b"\r\n--" + boundary
+        self.directory = directory
+        self.max_field_size = max_field_size
+        self.fields: List[Tuple[str, str]] = []
+        self.files: List[dict] = []
+        # the first boundary is not preceded by a line break
+        self._buffer = bytearray(b"\r\n")
+        self._state = "preamble"
+        self._part: Optional[dict] = None
+        self._file: Optional[IO[bytes]] = None
+        self._field: Optional[bytearray] = None
+
+    def feed(self, data: bytes) -> None:
+        self._buffer += data
+        while self._parse():
+            pass
+
+    def _parse(self) -> bool:
+        """Parse the buffer for the current state, False when more data is needed."""
+        buffer = self._buffer
+        if self._state == "preamble":
+            index = buffer.find(self.delimiter)
+            if index < 0:
+                # keep what may be the start of the delimiter
+                del buffer[: max(len(buffer) - len(self.delimiter), 0)]
+                return False
+            del buffer[: index + len(self.delimiter)]
+            self._state = "delimiter"
+            return True
+        if self._state == "delimiter":
+            if len(buffer) < 2:
+                return False
+            if buffer[:2] == b"--":
+                self._state = "end"
+                buffer.clear()
+                return False
+            if buffer[:2] != b"\r\n":
+                raise MultipartError("Invalid multipart boundary")
+            del buffer[:2]
+            self._state = "headers"
+            return True
+        if self._state == "headers":
+            index = buffer.find(b"\r\n\r\n")
+            if index < 0:
+                if len(buffer) > MAX_PART_HEADERS_SIZE:
+                    raise MultipartError("Multipart part headers too large")
+                return False
+            self._start_part(bytes(buffer[:index]))
+            del buffer[: index + 4]
+            self._state = "body"
+            return True
+        if self._state == "body":
+            index = buffer.find(self.delimiter)
+            if index < 0:
+                end = len(buffer) - len(self.delimiter) + 1
+                if end > 0:
+                    self._write(buffer[:end])
+                    del buffer[:end]
+                return False
+            self._write(buffer[:index])
+            del buffer[: index + len(self.delimiter)]
+            self._end_part()
+            self._state = "delimiter"
+            return True
+        # epilogue after the closing boundary is ignored
+        buffer.clear()
+        return False
+
+    def _start_part(self, raw_headers: bytes) -> None:
+        headers = {}
+        for line in raw_headers.decode("utf-8", "replace").split("\r\n"):
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        disposition, params = parse_header_params(
+            headers.get("content-disposition", "")
+        )
+        if disposition != "form-data" or "name" not in params:
+            raise MultipartError("Multipart part without a form-data name")
+        self._part = {"name": params["name"]}
+        if "filename" not in params:
+            self._field = bytearray()
+            return
+        self._part.update(
+            filename=params["filename"],
+            content_type=headers.get("content-type", "application/octet-stream"),
+            size=0,
+        )
+        self._file = tempfile.NamedTemporaryFile(
+            dir=self.directory, prefix="upload-", delete=False
+        )
+        self._part["path"] = self._file.name
+        self.files.append(self._part)
+
+    def _write(self, data: bytearray) -> None:
+        if not data:
+            return
+        if self._file is not None:
+            self._file.write(data)
+            self._part["size"] += len(data)
+            return
+        self._field += data
+        if len(self._field) > self.max_field_size:
+            raise MultipartError("Multipart field too large")
+
+    def _end_part(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        else:
+            value = self._field.decode("utf-8", "replace")
+            self.fields.append((self._part["name"], value))
+            self._field = None
+        self._part = None
+
+    def finish(self) -> dict:
+        """
+        The parsed body, given to the app in the scope extension.
+
+        Raises:
+            MultipartError: If the body ended before the closing boundary.
+        """
+        if self._state != "end":
+            raise MultipartError("Multipart body ended before the closing boundary")
+        return {"fields": self.fields, "files": self.files}
+
+    def cleanup(self) -> None:
+        """Remove the temporary files the app did not move."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for file in self.files:
+            try:
+                os.unlink(file["path"])
+            except OSError:
+                pass
+
+
+class MultipartUploads:
+    """
+    Parse `multipart/form-data` request bodies on some routes before calling the
+    app, writing the uploaded files straight to disk.
+
+    The app receives an empty body, with `Content-Length: 0` in its scope headers,
+    and the parsed body in the `rsgiadapter.multipart` scope extension::
+
+        {
+            "fields": [(name, value), ...],
+            "files": [
+                {"name": ..., "filename": ..., "content_type": ..., "path": ...,
+                 "size": ...},
+            ],
+        }
+
+    The files are removed once the response is sent, the app moves the ones it
+    keeps. Invalid bodies and boundaries are answered with `400`. The body is
+    parsed and the files are written in a worker thread, `FEED_BUFFER_SIZE` bytes
+    at a time.
+
+    Args:
+        paths: Path prefixes of the upload routes.
+        directory: Directory of the uploaded files, the system temporary directory
+            by default. Use a directory on the filesystem the files are moved to,
+            so moving them is a rename.
+        max_field_size: Maximum size in bytes of a field which is not a file.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[str],
+        directory: Optional[str] = None,
+        max_field_size: int = DEFAULT_MAX_FIELD_SIZE,
+    ):
+        self.paths = tuple(paths)
+        self.directory = directory
+        self.max_field_size = max_field_size
+
+    def parser(self, scope) -> Optional[MultipartParser]:
+        """
+        A parser for the body of an rsgi request scope, None if not an upload.
+
+        Raises:
+            MultipartError: If the boundary is not a valid RFC 2046 boundary.
+        """
+        if scope.method not in ("POST", "PUT", "PATCH"):
+            return None
+        if not scope.path.startswith(self.paths) or not scope.headers:
+            return None
+        content_type, params = parse_header_params(
+            scope.headers.get("content-type", "")
+        )
+        boundary = params.get("boundary")
+        if content_type != "multipart/form-data" or boundary is None:
+            return None
+        if not BOUNDARY_RE.fullmatch(boundary):
+            raise MultipartError("Invalid multipart boundary")
+        return MultipartParser(
+            boundary.encode("latin-1"), self.directory, self.max_field_size
+        )
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional
+
+from rsgiadapter.constant import EventTypeEnum
+
+
+class ThreadOffload:
+    """
+    Run the ASGI app for some paths in a thread pool owned by the adapter, so
+    blocking calls made directly from async code (a sync HTTP client, CPU bound
+    work) run in parallel instead of blocking the worker loop.
+
+    This does not parallelise Django sync views: Django still runs them through
+    asgiref's `sync_to_async`, in its own executor (a single thread with
+    `thread_sensitive=True`, the default), only the async handler and middlewares
+    move to this pool.
+
+    Every pool thread runs its own event loop, and the app is called there with
+    `receive` and `send` forwarded to the worker loop. Offloaded requests can't be
+    cancelled once they started: after the request is cancelled, `send` raises
+    `OSError` and `receive` returns `http.disconnect`. They must not use resources
+    bound to the worker loop, like connection pools created in an async lifespan.
+
+    The `queued`, `active` and `completed` attributes count the requests waiting
+    for a thread, running, and done.
+
+    Args:
+        paths: Path prefixes of the offloaded routes.
+        max_workers: Number of threads, `min(32, cpu_count + 4)` by default.
+    """
+
+    def __init__(self, paths: Iterable[str], max_workers: Optional[int] = None):
+        self.paths = tuple(paths)
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._loops: List[asyncio.AbstractEventLoop] = []
+
+    def matches(self, path: str) -> bool:
+        return path.startswith(self.paths)
+
+    async def run(
+        self,
+        app: Callable[..., Any],
+        scope: dict,
+        receive: Callable[[], Any],
+        send: Callable[[dict], Any],
+    ) -> None:
+        """Call `app` in a pool thread and wait for it to return."""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix="rsgiadapter-offload"
+            )
+        cancelled = False
+
+        async def guarded_receive():
+            if cancelled:
+                return {"type": EventTypeEnum.HTTP_DISCONNECT}
+            return await receive()
+
+        async def guarded_send(message):
+            if cancelled:
+                raise OSError("The request was cancelled")
+            await send(message)
+
+        with self._lock:
+            self.queued += 1
+        future = self.executor.submit(
+            self._call,
+            asyncio.get_running_loop(),
+            app,
+            scope,
+            guarded_receive,
+            guarded_send,
+        )
+        try:
+            await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # the app keeps running in its thread, it must not reach the client
+            cancelled = True
+            if future.cancelled():
+                with self._lock:
+                    self.queued -= 1
+            raise
+
+    def _call(self, worker_loop, app, scope, receive, send) -> None:
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            self._thread_loop().run_until_complete(
+                app(
+                    scope,
+                    lambda: self._forward(receive(), worker_loop),
+                    lambda message: self._forward(send(message), worker_loop),
+                )
+            )
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    @staticmethod
+    async def _forward(coroutine, worker_loop):
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(coroutine, worker_loop)
+        )
+
+    def _thread_loop(self) -> asyncio.AbstractEventLoop:
+        loop = getattr(self._local, "loop", None)
+        if loop is None:
+            loop = self._local.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            with self._lock:
+                self._loops.append(loop)
+        return loop
+
+    async def shutdown(self) -> None:
+        """
+        Stop the pool threads once the running requests are done. The pool is
+        joined from another thread, the running apps need the worker loop to
+        forward their `receive` and `send`.
+        """
+        if self.executor is not None:
+            executor, self.executor = self.executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True)
+        with self._lock:
+            loops, self._loops = self._loops, []
+        for loop in loops:
+            loop.close()
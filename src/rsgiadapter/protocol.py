@@ -1,4 +1,14 @@
-from typing import Any, Dict, Iterable, List, Optional, Tuple, TypedDict, Union
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    NotRequired,
+    Optional,
+    Tuple,
+    TypedDict,
+    Union,
+)
 
 
 class ASGIScope(TypedDict):
@@ -16,6 +26,7 @@ class ASGIScope(TypedDict):
     headers: Iterable[Tuple[Union[str, bytes], Union[str, bytes]]]
     root_path: str
     state: Optional[Dict[str, Any]]
+    subprotocols: NotRequired[List[str]]
 
 
 class RSGIHTTPScope(object):
@@ -97,6 +108,9 @@ class RSGIHTTPProtocol(object):
     def response_file(self, *args, **kwargs):
         pass
 
+    def response_file_range(self, *args, **kwargs):
+        pass
+
     def response_str(self, *args, **kwargs):
         pass
 
@@ -114,6 +128,9 @@ class RSGIHTTPProtocol(object):
     def __call__(self, *args, **kwargs):
         pass
 
+    async def client_disconnect(self, *args, **kwargs):
+        pass
+
     def __init__(self, *args, **kwargs):
         self.data = list(args)
 
@@ -122,8 +139,30 @@ class RSGIHTTPProtocol(object):
         pass
 
 
+class RSGIWebsocketMessage(object):
+    """RSGI Websocket Message template, for type hinting"""
+
+    kind: int
+    data: Optional[Union[bytes, str]]
+
+
+class RSGIWebsocketTransport(object):
+    """RSGI Websocket Transport template, for type hinting"""
+
+    async def receive(self, *args, **kwargs) -> RSGIWebsocketMessage:
+        pass
+
+    async def send_bytes(self, *args, **kwargs):
+        pass
+
+    async def send_str(self, *args, **kwargs):
+        pass
+
+
 class RSGIWebsocketProtocol(object):
-    def accept(self, *args, **kwargs):
+    """RSGI Websocket Protocol template, for type hinting"""
+
+    async def accept(self, *args, **kwargs) -> RSGIWebsocketTransport:
         pass
 
     def close(self, *args, **kwargs):
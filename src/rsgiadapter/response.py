@@ -1,7 +1,83 @@
 import warnings
 from dataclasses import dataclass, field
-from tempfile import SpooledTemporaryFile
-from typing import List, Optional, Tuple, Union
+from tempfile import TemporaryFile
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+
+def coalesce_chunks(chunks: Iterable[bytes], chunk_size: int) -> Iterator[bytes]:
+    """
+    Join adjacent chunks until they reach `chunk_size` bytes, larger chunks are
+    yielded as they are.
+    """
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= chunk_size:
+            yield pending[0] if len(pending) == 1 else b"".join(pending)
+            pending = []
+            pending_size = 0
+    if pending:
+        yield pending[0] if len(pending) == 1 else b"".join(pending)
+
+
+class MemoryBody:
+    """
+    In-memory body backend, keeps the chunks in a list as they were appended.
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.size = 0
+        self.closed = False
+
+    def write(self, data: bytes):
+        self.chunks.append(data)
+        self.size += len(data)
+
+    def read(self) -> bytes:
+        if len(self.chunks) == 1:
+            return self.chunks[0]
+        return b"".join(self.chunks)
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        return iter(self.chunks)
+
+    def close(self):
+        self.chunks = []
+        self.closed = True
+
+
+class FileBody:
+    """
+    Spill-to-disk body backend, backed by a temporary file.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.chunk_sizes: List[int] = []
+        self._file = TemporaryFile(mode="w+b")
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def write(self, data: bytes):
+        self._file.write(data)
+        self.size += len(data)
+        self.chunk_sizes.append(len(data))
+
+    def read(self) -> bytes:
+        self._file.seek(0)
+        return self._file.read()
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        self._file.seek(0)
+        return map(self._file.read, self.chunk_sizes)
+
+    def close(self):
+        self._file.close()
 
 
 class BodyManager:
@@ -9,46 +85,71 @@ class BodyManager:
     A body iterator that can be used to iterate over the body in chunks.
     Supports both synchronous and asynchronous iteration.
     Instance support reuse, but not suggested.
+
+    Chunks are kept in memory, the body is moved to a temporary file only when
+    `spill_threshold` is set and the body grows larger than it.
+    Iteration yields the chunks as they were appended, unless `chunk_size` is set,
+    then adjacent small chunks are joined until they reach `chunk_size` bytes.
+    Chunks are never split.
     Yields:
         Chunks of the body.
     Args:
-        chunk_size: The size of the chunks to be returned.
+        chunk_size: Target size of the yielded chunks, `None` keeps the original chunks.
+        spill_threshold: Body size in bytes above which the body is written to disk,
+            `None` keeps the body in memory.
 
     Returns:
         A generator that yields chunks of the body.
     """
 
-    def __init__(self, chunk_size: int = 1024 * 1024):
+    def __init__(
+        self, chunk_size: Optional[int] = None, spill_threshold: Optional[int] = None
+    ):
         self.chunk_size = chunk_size
+        self.spill_threshold = spill_threshold
         self._body_length = 0
-        self._body = SpooledTemporaryFile(max_size=1024 * 1024, mode="w+b")
+        self._body: Union[MemoryBody, FileBody] = MemoryBody()
+        self._chunks: Optional[Iterator[bytes]] = None
 
     @property
     def closed(self) -> bool:
         return self._body.closed
 
+    @property
+    def spilled(self) -> bool:
+        return isinstance(self._body, FileBody)
+
     def __len__(self):
         return self._body_length
 
+    @property
+    def size(self) -> int:
+        """Body size in bytes."""
+        return self._body.size
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        chunks = self._body.iter_chunks()
+        if self.chunk_size:
+            return coalesce_chunks(chunks, self.chunk_size)
+        return chunks
+
     def __iter__(self):
-        self._body.seek(0)  # Ensure iteration starts from the beginning
+        # Ensure iteration starts from the beginning
+        self._chunks = self.iter_chunks()
         return self
 
     def __next__(self):
-        chunk = self._body.read(self.chunk_size)
-        if not chunk:
-            raise StopIteration
-        return chunk
+        return next(self._chunks)
 
     def __aiter__(self):
-        self._body.seek(0)
+        self._chunks = self.iter_chunks()
         return self
 
     async def __anext__(self):
-        chunk = self._body.read(self.chunk_size)
-        if not chunk:
+        try:
+            return next(self._chunks)
+        except StopIteration:
             raise StopAsyncIteration
-        return chunk
 
     def __del__(self):
         try:
@@ -70,19 +171,33 @@ class BodyManager:
             data = data.encode("utf-8")
         self._body.write(data)
         self._body_length += 1
-        if self._body_length == 1:
-            self.chunk_size = len(data) or self.chunk_size
+        if (
+            self.spill_threshold is not None
+            and not self.spilled
+            and self._body.size > self.spill_threshold
+        ):
+            self.spill()
+
+    def spill(self):
+        """
+        Move the chunks kept in memory to a temporary file.
+        """
+        memory_body = self._body
+        self._body = FileBody()
+        for chunk in memory_body.chunks:
+            self._body.write(chunk)
+        memory_body.close()
 
     def get_body(self) -> bytes:
         if not self._body.closed:
-            self._body.seek(0)
             return self._body.read()
         return b""
 
     def clear_body(self):
         if not self.closed:
             self._body.close()
-        self._body = SpooledTemporaryFile(max_size=1024 * 1024, mode="w+b")
+        self._body = MemoryBody()
+        self._chunks = None
         self._body_length = 0
 
 
@@ -90,13 +205,58 @@ class BodyManager:
 class Response:
     status: Optional[int] = None
     headers: Union[List[tuple], Tuple[tuple]] = field(default_factory=list)
-    body: BodyManager = field(default_factory=BodyManager)
+    body: Optional[BodyManager] = field(default_factory=BodyManager)
     path: Optional[str] = b""
     stream: Optional[bool] = False
     type: Optional[str] = None
+    # Body of a single-message response, kept as the original bytes object
+    content: Optional[bytes] = None
+    spill_threshold: Optional[int] = None
+    chunk_size: Optional[int] = None
+
+    def append(self, data: Union[bytes, str]):
+        """
+        Add a body chunk. The first bytes chunk is kept as is in `content`, a
+        `BodyManager` is only created once a second chunk arrives.
+        """
+        if self.body is None:
+            if self.content is None and isinstance(data, bytes):
+                self.content = data
+                return
+            self.body = BodyManager(
+                chunk_size=self.chunk_size, spill_threshold=self.spill_threshold
+            )
+            if self.content is not None:
+                self.body.append(self.content)
+                self.content = None
+        self.body.append(data)
+
+    @property
+    def size(self) -> int:
+        """Body size in bytes."""
+        if self.content is not None:
+            return len(self.content)
+        if self.body is None:
+            return 0
+        return self.body.size
 
     def get_body(self) -> bytes:
+        if self.content is not None:
+            return self.content
+        if self.body is None:
+            return b""
         return self.body.get_body()
 
+    def join_body(self) -> bytes:
+        """Join the body chunks into `content`, and return it."""
+        if self.content is None:
+            self.content = self.get_body()
+            if self.body is not None:
+                self.body.clear_body()
+                self.body = None
+        return self.content
+
     def clear_body(self):
-        self.body.clear_body()
+        self.content = None
+        if self.body is not None:
+            self.body.clear_body()
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Optional
+
+logger = logging.getLogger("rsgiadapter")
+
+
+class WatermarkTransport:
+    """
+    A rsgi stream transport wrapper that lets the app send ahead of the client.
+
+    Chunks given to `send_bytes` are queued and written to the transport by a writer
+    task. Once more than `high_watermark` bytes are queued, `send_bytes` blocks until
+    the queue drains to `low_watermark` bytes, which bounds the memory used by a
+    fast app and a slow client.
+
+    Args:
+        transport: The rsgi stream transport, from `protocol.response_stream`.
+        high_watermark: Queued size in bytes above which the app is paused.
+        low_watermark: Queued size in bytes at which the app is resumed,
+            half of `high_watermark` by default.
+    """
+
+    def __init__(
+        self, transport, high_watermark: int, low_watermark: Optional[int] = None
+    ):
+        self.transport = transport
+        self.high_watermark = high_watermark
+        self.low_watermark = (
+            high_watermark // 2 if low_watermark is None else low_watermark
+        )
+        self.size = 0
+        self.error: Optional[BaseException] = None
+        self._chunks: Deque[bytes] = deque()
+        self._closed = False
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._write())
+
+    async def send_bytes(self, data: bytes):
+        if self.error is not None:
+            raise self.error
+        self._chunks.append(data)
+        self.size += len(data)
+        self._wakeup.set()
+        if self.size > self.high_watermark:
+            self._writable.clear()
+            await self._writable.wait()
+            if self.error is not None:
+                raise self.error
+
+    async def _write(self):
+        while True:
+            while self._chunks:
+                chunk = self._chunks.popleft()
+                try:
+                    await self.transport.send_bytes(chunk)
+                except Exception as e:
+                    self.error = e
+                    self._chunks.clear()
+                    self._writable.set()
+                    return
+                self.size -= len(chunk)
+                if self.size <= self.low_watermark:
+                    self._writable.set()
+            if self._closed:
+                return
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def close(self, abort: bool = False):
+        """
+        Wait until every queued chunk is written, or drop them when `abort` is set.
+        """
+        if abort:
+            self._task.cancel()
+            return
+        self._closed = True
+        self._wakeup.set()
+        await self._task
+        if self.error is not None:
+            logger.debug("Failed to write response stream", exc_info=self.error)
@@ -1,10 +1,13 @@
+import asyncio
 import inspect
 import unittest
+from contextlib import asynccontextmanager
 from pathlib import Path
 from types import CodeType
 from unittest.mock import AsyncMock, MagicMock, Mock, NonCallableMock, call
 
-from rsgiadapter.asgi import ASGIToRSGIAdapter
+from rsgiadapter.asgi import ASGIToRSGI, ASGIToRSGIAdapter
+from rsgiadapter.constant import WebsocketMessageType
 from rsgiadapter.response import BodyManager, Response
 
 
@@ -37,6 +40,15 @@ class MockAsyncIterator:
         return self
 
 
+def make_http_scope(path="/", headers=None, **attrs) -> Mock:
+    """A mock rsgi HTTP scope, the other attributes are set from `attrs`."""
+    scope = Mock(
+        proto="http", server="", client="", path=path, query_string="", **attrs
+    )
+    scope.headers = {} if headers is None else headers
+    return scope
+
+
 class TestMakeASGIScope(unittest.TestCase):
 
     def setUp(self):
@@ -74,6 +86,21 @@ class TestMakeASGIScope(unittest.TestCase):
         self.assertEqual(result["query_string"], b"key=value")
         self.assertEqual(result["headers"], [(b"Content-Type", b"application/json")])
 
+    def test_constant_parts_shared(self):
+        first = self.asgi_app.make_asgi_scope(self.test_scope)
+        second = ASGIToRSGIAdapter(None).make_asgi_scope(self.test_scope)
+        self.assertIs(first["headers"][0][0], second["headers"][0][0])
+
+    def test_mutable_parts_not_shared(self):
+        first = self.asgi_app.make_asgi_scope(self.test_scope)
+        first["extensions"]["http.response.pathsend"]["custom"] = True
+        first["extensions"]["custom"] = {}
+        first["asgi"]["version"] = "2.0"
+        second = self.asgi_app.make_asgi_scope(self.test_scope)
+        self.assertEqual(second["extensions"]["http.response.pathsend"], {})
+        self.assertNotIn("custom", second["extensions"])
+        self.assertEqual(second["asgi"]["version"], "3.0")
+
 
 class TestYieldBody(unittest.IsolatedAsyncioTestCase):
     async def test_yield_body(self):
@@ -153,6 +180,17 @@ class TestPerformResponse(unittest.IsolatedAsyncioTestCase):
             file=Path("test.txt"),
         )
 
+    async def test_response_file_not_modified(self):
+        self.protocol.response_empty = Mock()
+        self.response.path = Path("test.txt")
+        self.response.headers = [("etag", '"abc"')]
+        scope = Mock(method="GET", headers={"if-none-match": '"abc"'})
+        await self.adapter.perform_response(self.protocol, self.response, scope)
+        self.protocol.response_empty.assert_called_once_with(
+            status=304, headers=[("etag", '"abc"')]
+        )
+        self.protocol.response_file.assert_not_called()
+
     async def test_response_stream(self):
         await self.adapter.perform_response(self.protocol, self.response)
         self.protocol.response_stream.assert_called_once_with(
@@ -166,14 +204,600 @@ class TestPerformResponse(unittest.IsolatedAsyncioTestCase):
             ]
         )
 
-    async def test_response_bytes(self):
+    async def test_response_empty(self):
+        self.protocol.response_empty = Mock()
         self.response.body = BodyManager()
         await self.adapter.perform_response(self.protocol, self.response)
+        self.protocol.response_empty.assert_called_once_with(
+            status=200,
+            headers=[("Content-Type", "text/plain")],
+        )
+        self.protocol.response_bytes.assert_not_called()
+
+    async def test_response_bytes(self):
+        body = b"hello"
+        self.response.body = None
+        self.response.append(body)
+        await self.adapter.perform_response(self.protocol, self.response)
         self.protocol.response_bytes.assert_called_once_with(
             status=200,
             headers=[("Content-Type", "text/plain")],
-            body=b"",
+            body=body,
+        )
+        self.assertIs(self.protocol.response_bytes.call_args.kwargs["body"], body)
+
+    async def test_response_presized(self):
+        self.response.headers = [("content-length", "10")]
+        await self.adapter.perform_response(self.protocol, self.response)
+        self.protocol.response_bytes.assert_called_once_with(
+            status=200, headers=[("content-length", "10")], body=b"helloworld"
+        )
+        self.protocol.response_stream.assert_not_called()
+
+    async def test_response_presized_length_mismatch(self):
+        self.response.headers = [("content-length", "12")]
+        await self.adapter.perform_response(self.protocol, self.response)
+        self.protocol.response_stream.assert_called_once()
+
+
+class TestGetResponse(unittest.IsolatedAsyncioTestCase):
+
+    async def make_response(self, *messages):
+        send_queue = asyncio.Queue()
+        for message in messages:
+            send_queue.put_nowait(message)
+        return await ASGIToRSGIAdapter(None).get_response(send_queue)
+
+    async def test_single_body_kept_without_buffer(self):
+        body = b"hello"
+        response = await self.make_response(
+            {"type": "http.response.start", "status": 200, "headers": []},
+            {"type": "http.response.body", "body": body},
+        )
+        self.assertIs(response.content, body)
+        self.assertIsNone(response.body)
+
+    async def test_multiple_bodies_buffered(self):
+        response = await self.make_response(
+            {"type": "http.response.start", "status": 200, "headers": []},
+            {"type": "http.response.body", "body": b"hello", "more_body": True},
+            {"type": "http.response.body", "body": b"world"},
+        )
+        self.assertIsNone(response.content)
+        self.assertEqual(response.get_body(), b"helloworld")
+
+
+class TestStreamingResponse(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.scope = Mock()
+        self.scope.proto = "http"
+        self.scope.server = "127.0.0.1:8000"
+        self.scope.client = "127.0.0.1:1234"
+        self.scope.path = "/"
+        self.scope.query_string = ""
+        self.scope.headers = {}
+        self.protocol = MockAsyncIterator(iter([]))
+        self.transport = Stream()
+        self.transport.send_bytes = AsyncMock()
+        self.protocol.response_stream = Mock(return_value=self.transport)
+        self.protocol.response_bytes = Mock()
+        self.protocol.response_empty = Mock()
+        self.protocol.response_file = Mock()
+
+    async def test_chunks_forwarded_as_sent(self):
+        sent_before_end = []
+
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"a", "more_body": True})
+            sent_before_end.extend(self.transport.send_bytes.await_args_list)
+            await send({"type": "http.response.body", "body": b"b", "more_body": False})
+
+        adapter = ASGIToRSGIAdapter(app, streaming=True)
+        await adapter(self.scope, self.protocol)
+        self.assertEqual(sent_before_end, [call(b"a")])
+        self.protocol.response_stream.assert_called_once_with(status=200, headers=[])
+        self.transport.send_bytes.assert_has_calls([call(b"a"), call(b"b")])
+
+    async def test_single_body_uses_response_bytes(self):
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"hello"})
+
+        await ASGIToRSGIAdapter(app, streaming=True)(self.scope, self.protocol)
+        self.protocol.response_bytes.assert_called_once_with(
+            status=200, headers=[], body=b"hello"
+        )
+        self.protocol.response_stream.assert_not_called()
+
+    async def test_start_without_body_is_empty(self):
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 204, "headers": []})
+
+        await ASGIToRSGIAdapter(app, streaming=True)(self.scope, self.protocol)
+        self.protocol.response_empty.assert_called_once_with(status=204, headers=[])
+
+    async def test_early_hints_as_link_headers(self):
+        async def app(scope, receive, send):
+            links = [b"</a.css>; rel=preload"]
+            await send({"type": "http.response.early_hint", "links": links})
+            await send({"type": "http.response.push", "path": "/b.js", "headers": []})
+            accept = [(b"accept", b"image/webp,*/*")]
+            await send({"type": "http.response.push", "path": "/c", "headers": accept})
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.push", "path": "/d.js", "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        for streaming in (True, False):
+            self.protocol.response_bytes.reset_mock()
+            adapter = ASGIToRSGIAdapter(app, streaming=streaming)
+            extensions = adapter.make_asgi_scope(self.scope)["extensions"]
+            self.assertIn("http.response.early_hint", extensions)
+            self.assertNotIn("http.response.trailers", extensions)
+            await adapter(self.scope, self.protocol)
+            self.assertEqual(
+                self.protocol.response_bytes.call_args.kwargs["headers"],
+                [
+                    ("link", "</a.css>; rel=preload"),
+                    ("link", "</b.js>; rel=preload; as=script"),
+                    ("link", "</c>; rel=preload; as=image"),
+                    ("link", "</d.js>; rel=preload; as=script"),
+                ],
+            )
+
+    async def test_push_after_headers_sent(self):
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"o", "more_body": True})
+            await send({"type": "http.response.push", "path": "/a.js", "headers": []})
+            await send({"type": "http.response.body", "body": b"k"})
+
+        # buffered, the headers are not sent until the app returns
+        await ASGIToRSGIAdapter(app)(self.scope, self.protocol)
+        self.assertEqual(
+            self.protocol.response_stream.call_args.kwargs["headers"],
+            [("link", "</a.js>; rel=preload; as=script")],
+        )
+        adapter = ASGIToRSGIAdapter(app, streaming=True)
+        with self.assertLogs("rsgiadapter", "DEBUG") as logs:
+            await adapter(self.scope, self.protocol)
+            await adapter(self.scope, self.protocol)
+        self.assertEqual(self.protocol.response_stream.call_args.kwargs["headers"], [])
+        pushes = [line for line in logs.output if "Push" in line]
+        self.assertEqual(len(pushes), 1)
+
+    async def test_trailers_complete_response(self):
+        events = []
+
+        async def app(scope, receive, send):
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [],
+                    "trailers": True,
+                }
+            )
+            await send({"type": "http.response.body", "body": b"ok"})
+            events.append(await receive())
+            await send(
+                {"type": "http.response.trailers", "headers": [(b"grpc-status", b"0")]}
+            )
+            events.append(await receive())
+
+        self.protocol.client_disconnect = asyncio.Event().wait
+        adapter = ASGIToRSGIAdapter(app, streaming=True)
+        await adapter(self.scope, self.protocol)
+        self.protocol.response_bytes.assert_called_once_with(
+            status=200, headers=[], body=b"ok"
+        )
+        self.assertEqual(events[-1], {"type": "http.disconnect"})
+
+    def sized_app(self, content_length, *chunks):
+        async def app(scope, receive, send):
+            headers = [(b"content-length", content_length)]
+            await send(
+                {"type": "http.response.start", "status": 200, "headers": headers}
+            )
+            for chunk in chunks:
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": True}
+                )
+            await send({"type": "http.response.body", "body": b""})
+
+        return app
+
+    async def test_presized_single_body(self):
+        app = self.sized_app(b"2", b"a", b"b")
+        await ASGIToRSGIAdapter(app, streaming=True)(self.scope, self.protocol)
+        self.protocol.response_bytes.assert_called_once_with(
+            status=200, headers=[("content-length", "2")], body=b"ab"
+        )
+        self.protocol.response_stream.assert_not_called()
+
+    async def test_presized_above_threshold_streamed(self):
+        app = self.sized_app(b"2", b"a", b"b")
+        adapter = ASGIToRSGIAdapter(app, streaming=True, presize_threshold=1)
+        await adapter(self.scope, self.protocol)
+        self.protocol.response_bytes.assert_not_called()
+        self.transport.send_bytes.assert_has_calls([call(b"a"), call(b"b")])
+
+    async def test_presized_longer_than_declared_streamed(self):
+        app = self.sized_app(b"1", b"a", b"b", b"c")
+        await ASGIToRSGIAdapter(app, streaming=True)(self.scope, self.protocol)
+        self.protocol.response_bytes.assert_not_called()
+        self.transport.send_bytes.assert_has_calls([call(b"a"), call(b"b"), call(b"c")])
+
+
+class TestReceiveBody(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.scope = Mock()
+        self.scope.proto = "http"
+        self.scope.server = "127.0.0.1:8000"
+        self.scope.client = "127.0.0.1:1234"
+        self.scope.path = "/"
+        self.scope.query_string = ""
+
+    async def receive_all(self, protocol, **kwargs):
+        messages = []
+
+        async def app(scope, receive, send):
+            while True:
+                message = await receive()
+                messages.append(message)
+                if not message["more_body"]:
+                    break
+
+        await ASGIToRSGIAdapter(app, **kwargs)(self.scope, protocol)
+        return messages
+
+    async def test_read_body_at_once(self):
+        self.scope.headers = {"content-length": "10"}
+        protocol = AsyncMock(return_value=b"helloworld")
+        messages = await self.receive_all(protocol)
+        self.assertEqual(
+            messages,
+            [{"type": "http.request", "body": b"helloworld", "more_body": False}],
+        )
+        protocol.assert_awaited_once()
+
+    async def test_stream_body_above_threshold(self):
+        self.scope.headers = {"content-length": "10"}
+        protocol = MockAsyncIterator(iter([b"hello", b"world"]))
+        messages = await self.receive_all(protocol, body_read_threshold=5)
+        self.assertEqual(
+            [message["body"] for message in messages], [b"hello", b"world", b""]
+        )
+
+    async def test_content_length_too_large(self):
+        self.scope.headers = {"content-length": "11"}
+        app = AsyncMock()
+        protocol = Mock()
+        await ASGIToRSGIAdapter(app, max_body_size=10)(self.scope, protocol)
+        app.assert_not_awaited()
+        protocol.response_empty.assert_called_once_with(
+            status=413, headers=[("connection", "close")]
+        )
+
+    async def test_streamed_body_too_large(self):
+        self.scope.headers = {"transfer-encoding": "chunked"}
+        protocol = MockAsyncIterator(iter([b"hello", b"world", b"!"]))
+        protocol.response_empty = Mock()
+        protocol.response_bytes = Mock()
+        messages = []
+
+        async def app(scope, receive, send):
+            while True:
+                message = await receive()
+                messages.append(message)
+                if message["type"] == "http.disconnect":
+                    break
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        await ASGIToRSGIAdapter(app, max_body_size=8)(self.scope, protocol)
+        self.assertEqual(
+            messages,
+            [
+                {"type": "http.request", "body": b"hello", "more_body": True},
+                {"type": "http.disconnect"},
+            ],
+        )
+        protocol.response_bytes.assert_not_called()
+        protocol.response_empty.assert_called_once_with(
+            status=413, headers=[("connection", "close")]
+        )
+
+    async def test_stream_body_without_content_length(self):
+        self.scope.headers = {"transfer-encoding": "chunked"}
+        protocol = MockAsyncIterator(iter([b"hello"]))
+        messages = await self.receive_all(protocol)
+        self.assertEqual([message["body"] for message in messages], [b"hello", b""])
+
+
+class TestDisconnect(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.scope = make_http_scope()
+        self.client_gone = asyncio.Event()
+        self.protocol = MockAsyncIterator(iter([]))
+        self.protocol.client_disconnect = self.client_gone.wait
+        self.protocol.response_bytes = Mock()
+
+    async def test_receive_waits_for_client_disconnect(self):
+        messages = []
+
+        async def app(scope, receive, send):
+            messages.append(await receive())
+            asyncio.get_running_loop().call_soon(self.client_gone.set)
+            messages.append(await receive())
+
+        await ASGIToRSGIAdapter(app)(self.scope, self.protocol)
+        self.assertEqual(messages[1], {"type": "http.disconnect"})
+        self.protocol.response_bytes.assert_not_called()
+
+    async def test_receive_returns_after_response_complete(self):
+        messages = []
+
+        async def app(scope, receive, send):
+            await receive()
+
+            async def listen():
+                messages.append(await receive())
+
+            listener = asyncio.ensure_future(listen())
+            await asyncio.sleep(0)
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+            await listener
+
+        await ASGIToRSGIAdapter(app)(self.scope, self.protocol)
+        self.assertEqual(messages, [{"type": "http.disconnect"}])
+        self.protocol.response_bytes.assert_called_once()
+
+    async def test_app_cancelled_after_disconnect(self):
+        cancelled = False
+
+        async def app(scope, receive, send):
+            nonlocal cancelled
+            self.client_gone.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+
+        adapter = ASGIToRSGIAdapter(app, disconnect_grace_period=0)
+        await asyncio.wait_for(adapter(self.scope, self.protocol), 1)
+        self.assertTrue(cancelled)
+        self.protocol.response_bytes.assert_not_called()
+
+    async def test_body_read_failure_is_disconnect(self):
+        messages = []
+
+        async def app(scope, receive, send):
+            messages.append(await receive())
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        self.scope.headers = {"content-length": "10"}
+        self.protocol = Mock(side_effect=ConnectionResetError)
+        self.protocol.response_bytes = Mock()
+        with self.assertNoLogs("rsgiadapter", "INFO"):
+            await ASGIToRSGIAdapter(app)(self.scope, self.protocol)
+        self.assertEqual(messages, [{"type": "http.disconnect"}])
+        self.protocol.response_bytes.assert_not_called()
+
+
+class TestMakeRSGIHeaders(unittest.TestCase):
+
+    def test_latin1(self):
+        headers = ASGIToRSGIAdapter.make_rsgi_headers(
+            [(b"x-name", "caf\xe9".encode("latin-1"))]
+        )
+        self.assertEqual(headers, [("x-name", "caf\xe9")])
+
+    def test_repeated_header_name_reused(self):
+        header = [(b"content-type", b"application/json")]
+        first = ASGIToRSGIAdapter.make_rsgi_headers(header)
+        second = ASGIToRSGIAdapter.make_rsgi_headers(header)
+        self.assertEqual(first, [("content-type", "application/json")])
+        self.assertIs(first[0][0], second[0][0])
+        self.assertIsNot(first[0][1], second[0][1])
+
+    def test_bytearray(self):
+        headers = ASGIToRSGIAdapter.make_rsgi_headers(
+            [(b"x-name", bytearray(b"value"))]
+        )
+        self.assertEqual(headers, [("x-name", "value")])
+
+
+class TestASGIToRSGI(unittest.IsolatedAsyncioTestCase):
+
+    async def test_adapter_reused_with_fresh_state(self):
+        states = []
+
+        async def app(scope, receive, send):
+            states.append(scope["state"])
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        rsgi_app = ASGIToRSGI(app)
+        adapter = rsgi_app.adapter
+        for _ in range(2):
+            scope = make_http_scope()
+            protocol = Mock(response_bytes=Mock())
+            await rsgi_app.__rsgi__(scope, protocol)
+            protocol.response_bytes.assert_called_once_with(
+                status=200, headers=[], body=b"ok"
+            )
+        self.assertIs(rsgi_app.adapter, adapter)
+        self.assertIsNot(states[0], states[1])
+
+
+class TestRSGILifespan(unittest.TestCase):
+
+    def setUp(self):
+        self.events = []
+
+        @asynccontextmanager
+        async def lifespan(_app):
+            self.events.append(("startup", asyncio.get_running_loop()))
+            yield
+            self.events.append(("shutdown", asyncio.get_running_loop()))
+
+        self.lifespan = lifespan
+
+    def test_lifespan_runs_on_worker_loop(self):
+        rsgi_app = ASGIToRSGI(None, lifespan=self.lifespan)
+        self.assertEqual(self.events, [])
+        loop = asyncio.new_event_loop()
+        try:
+            rsgi_app.__rsgi_init__(loop)
+            rsgi_app.__rsgi_del__(loop)
+        finally:
+            loop.close()
+        self.assertEqual(self.events, [("startup", loop), ("shutdown", loop)])
+
+    def test_asgi_lifespan_state(self):
+        request_states = []
+
+        async def app(scope, receive, send):
+            if scope["type"] == "lifespan":
+                while True:
+                    message = await receive()
+                    self.events.append(message["type"])
+                    if message["type"] == "lifespan.startup":
+                        scope["state"]["pool"] = "pool"
+                        await send({"type": "lifespan.startup.complete"})
+                    else:
+                        await send({"type": "lifespan.shutdown.complete"})
+                        return
+            request_states.append(scope["state"])
+            scope["state"]["request"] = True
+            await send({"type": "http.response.start", "status": 204, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        rsgi_app = ASGIToRSGI(app)
+        loop = asyncio.new_event_loop()
+        try:
+            rsgi_app.__rsgi_init__(loop)
+            for _ in range(2):
+                scope = make_http_scope()
+                loop.run_until_complete(rsgi_app.__rsgi__(scope, Mock()))
+            self.assertEqual(rsgi_app.adapter.state, {"pool": "pool"})
+            rsgi_app.__rsgi_del__(loop)
+        finally:
+            loop.close()
+        self.assertEqual(self.events, ["lifespan.startup", "lifespan.shutdown"])
+        self.assertEqual(request_states[0]["pool"], "pool")
+        self.assertIsNot(request_states[0], request_states[1])
+
+    def test_startup_failed(self):
+        async def app(scope, receive, send):
+            await receive()
+            await send({"type": "lifespan.startup.failed", "message": "no database"})
+
+        rsgi_app = ASGIToRSGI(app)
+        loop = asyncio.new_event_loop()
+        try:
+            with self.assertLogs("rsgiadapter.lifespan"):
+                with self.assertRaises(RuntimeError):
+                    rsgi_app.__rsgi_init__(loop)
+        finally:
+            loop.close()
+
+    def test_shutdown_without_startup(self):
+        rsgi_app = ASGIToRSGI(None, lifespan=self.lifespan)
+        loop = asyncio.new_event_loop()
+        try:
+            rsgi_app.__rsgi_del__(loop)
+        finally:
+            loop.close()
+        self.assertEqual(self.events, [])
+
+
+class TestWebsocket(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.scope = Mock()
+        self.scope.proto = "websocket"
+        self.scope.server = "127.0.0.1:8000"
+        self.scope.client = "127.0.0.1:1234"
+        self.scope.scheme = "https"
+        self.scope.path = "/ws"
+        self.scope.query_string = ""
+        self.scope.headers = {"sec-websocket-protocol": "chat, json"}
+        self.transport = Mock()
+        self.transport.receive = AsyncMock(
+            side_effect=[
+                Mock(kind=WebsocketMessageType.string, data="hello"),
+                Mock(kind=WebsocketMessageType.bytes, data=b"world"),
+                Mock(kind=WebsocketMessageType.close, data=None),
+            ]
+        )
+        self.transport.send_str = AsyncMock()
+        self.transport.send_bytes = AsyncMock()
+        self.protocol = Mock()
+        self.protocol.accept = AsyncMock(return_value=self.transport)
+        self.protocol.close = Mock()
+
+    def test_scope(self):
+        result = ASGIToRSGIAdapter(None).make_asgi_scope(self.scope)
+        self.assertEqual(result["type"], "websocket")
+        self.assertEqual(result["scheme"], "wss")
+        self.assertEqual(result["subprotocols"], ["chat", "json"])
+        self.assertNotIn("method", result)
+
+    async def test_echo(self):
+        received = []
+
+        async def app(scope, receive, send):
+            received.append(await receive())
+            await send({"type": "websocket.accept"})
+            while True:
+                message = await receive()
+                received.append(message)
+                if message["type"] == "websocket.disconnect":
+                    break
+                await send({**message, "type": "websocket.send"})
+
+        await ASGIToRSGIAdapter(app)(self.scope, self.protocol)
+        self.assertEqual(
+            received,
+            [
+                {"type": "websocket.connect"},
+                {"type": "websocket.receive", "text": "hello"},
+                {"type": "websocket.receive", "bytes": b"world"},
+                {"type": "websocket.disconnect", "code": 1005},
+            ],
         )
+        self.protocol.accept.assert_awaited_once()
+        self.transport.send_str.assert_awaited_once_with("hello")
+        self.transport.send_bytes.assert_awaited_once_with(b"world")
+        self.protocol.close.assert_called_once_with(1000)
+
+    async def test_accept_subprotocol_warns(self):
+        async def app(scope, receive, send):
+            await receive()
+            await send({"type": "websocket.accept", "subprotocol": "chat"})
+            await send({"type": "websocket.close"})
+
+        with self.assertLogs("rsgiadapter", "WARNING") as logs:
+            await ASGIToRSGIAdapter(app)(self.scope, self.protocol)
+        self.assertIn("subprotocol", logs.output[0])
+        self.protocol.accept.assert_awaited_once_with()
+
+    async def test_reject(self):
+        async def app(scope, receive, send):
+            await receive()
+            await send({"type": "websocket.close", "code": 1008})
+
+        await ASGIToRSGIAdapter(app)(self.scope, self.protocol)
+        self.protocol.accept.assert_not_awaited()
+        self.protocol.close.assert_called_once_with(1008)
 
 
 if __name__ == "__main__":
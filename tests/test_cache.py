@@ -0,0 +1,164 @@
+import unittest
+from unittest.mock import Mock, patch
+
+from rsgiadapter.asgi import ASGIToRSGIAdapter
+from rsgiadapter.cache import ResponseCache
+from rsgiadapter.compression import Compression
+
+from .test_asgi import MockAsyncIterator, Stream, make_http_scope
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(
+            max_size=100, vary=["accept-language"], max_entry_size=80
+        )
+
+    def scope(self, method="GET", headers=None, path="/", authority="a.test"):
+        return Mock(
+            method=method,
+            scheme="https",
+            authority=authority,
+            path=path,
+            query_string="",
+            headers=headers or {},
+        )
+
+    def test_key(self):
+        self.assertEqual(
+            self.cache.key(self.scope()), ("https", "a.test", "/", "", (None,), None)
+        )
+        self.assertEqual(
+            self.cache.key(self.scope(headers={"accept-language": "fr"}), "gzip"),
+            ("https", "a.test", "/", "", ("fr",), "gzip"),
+        )
+        self.assertEqual(
+            self.cache.key(self.scope(authority=None, headers={"host": "b.test"})),
+            ("https", "b.test", "/", "", (None,), None),
+        )
+        self.assertIsNone(self.cache.key(self.scope(method="POST")))
+        self.assertIsNone(self.cache.key(self.scope(headers={"cookie": "a=b"})))
+
+    def test_max_age(self):
+        max_age = self.cache.max_age
+        self.assertEqual(max_age(200, [("cache-control", "public, max-age=5")]), 5)
+        self.assertEqual(max_age(200, [("cache-control", "max-age=5, s-maxage=1")]), 1)
+        self.assertIsNone(max_age(200, []))
+        self.assertIsNone(max_age(404, [("cache-control", "max-age=5")]))
+        self.assertIsNone(max_age(200, [("cache-control", "no-store")]))
+        self.assertIsNone(
+            max_age(200, [("cache-control", "max-age=5"), ("set-cookie", "a=b")])
+        )
+        self.assertIsNone(
+            max_age(200, [("cache-control", "max-age=5"), ("vary", "cookie")])
+        )
+        self.assertEqual(
+            max_age(200, [("cache-control", "max-age=5"), ("vary", "Accept-Language")]),
+            5,
+        )
+
+    def test_expires(self):
+        self.cache.store("a", 200, [], b"body", 1)
+        self.assertEqual(self.cache.get("a").body, b"body")
+        with patch("rsgiadapter.cache.time.monotonic", return_value=1e12):
+            self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.size, 0)
+
+    def test_lru_eviction(self):
+        for key in "abc":
+            self.cache.store(key, 200, [], b"x" * 8, 60)
+        self.cache.get("a")
+        self.cache.store("d", 200, [], b"x" * 80, 60)
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertLessEqual(self.cache.size, 100)
+
+    def test_max_entry_size(self):
+        self.cache.store("a", 200, [], b"x" * 81, 60)
+        self.assertEqual(len(self.cache), 0)
+
+
+class TestCachedResponse(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.calls = 0
+
+    async def app(self, scope, receive, send):
+        self.calls += 1
+        headers = [(b"cache-control", b"max-age=60"), (b"date", b"x")]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b"a", "more_body": True})
+        await send({"type": "http.response.body", "body": b"b"})
+
+    async def request(self, adapter, method="GET", headers=None, authority="a.test"):
+        scope = make_http_scope(
+            headers=headers, method=method, scheme="http", authority=authority
+        )
+        protocol = MockAsyncIterator(iter([]))
+        protocol.response_bytes = Mock()
+        protocol.response_empty = Mock()
+        protocol.response_stream = Mock(return_value=Stream())
+        await adapter(scope, protocol)
+        return protocol
+
+    async def test_hit_skips_app(self):
+        adapter = ASGIToRSGIAdapter(self.app, cache=ResponseCache())
+        await self.request(adapter)
+        protocol = await self.request(adapter)
+        self.assertEqual(self.calls, 1)
+        protocol.response_bytes.assert_called_once_with(
+            status=200,
+            headers=[("cache-control", "max-age=60"), ("age", "0")],
+            body=b"ab",
+        )
+        protocol = await self.request(adapter, method="HEAD")
+        self.assertEqual(self.calls, 1)
+        protocol.response_empty.assert_called_once()
+
+    async def test_hosts_not_shared(self):
+        adapter = ASGIToRSGIAdapter(self.app, cache=ResponseCache())
+        await self.request(adapter)
+        await self.request(adapter, authority="b.test")
+        self.assertEqual(self.calls, 2)
+
+    async def test_hit_sent_encoded(self):
+        body = b"x" * 1000
+
+        async def app(scope, receive, send):
+            self.calls += 1
+            headers = [
+                (b"cache-control", b"max-age=60"),
+                (b"content-type", b"text/plain"),
+            ]
+            await send(
+                {"type": "http.response.start", "status": 200, "headers": headers}
+            )
+            await send({"type": "http.response.body", "body": body})
+
+        compression = Compression(encodings=["gzip"])
+        adapter = ASGIToRSGIAdapter(app, cache=ResponseCache(), compression=compression)
+        gzip = {"accept-encoding": "gzip"}
+        first = await self.request(adapter, headers=gzip)
+        with patch.object(compression, "compress") as compress:
+            second = await self.request(adapter, headers=gzip)
+            plain = await self.request(adapter)
+            compress.assert_not_called()
+        self.assertEqual(self.calls, 2)
+        sent = first.response_bytes.call_args.kwargs
+        cached = second.response_bytes.call_args.kwargs
+        self.assertEqual(cached["body"], sent["body"])
+        self.assertEqual(cached["headers"], sent["headers"] + [("age", "0")])
+        self.assertIn(("vary", "accept-encoding"), cached["headers"])
+        self.assertEqual(plain.response_bytes.call_args.kwargs["body"], body)
+
+    async def test_head_not_stored(self):
+        adapter = ASGIToRSGIAdapter(self.app, cache=ResponseCache())
+        await self.request(adapter, method="HEAD")
+        await self.request(adapter)
+        self.assertEqual(self.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
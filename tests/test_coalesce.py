@@ -0,0 +1,124 @@
+import asyncio
+import unittest
+from unittest.mock import Mock
+
+from rsgiadapter.asgi import ASGIToRSGI, ASGIToRSGIAdapter
+from rsgiadapter.coalesce import SingleFlight
+
+from .test_asgi import MockAsyncIterator, Stream, make_http_scope
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.headers = []
+
+    async def app(self, scope, receive, send):
+        self.calls += 1
+        await self.release.wait()
+        await send(
+            {"type": "http.response.start", "status": 200, "headers": self.headers}
+        )
+        await send({"type": "http.response.body", "body": b"a", "more_body": True})
+        await send({"type": "http.response.body", "body": b"b"})
+
+    async def request(self, adapter, path="/status", headers=None, authority=None):
+        scope = make_http_scope(
+            path,
+            headers or {"host": "a.test"},
+            method="GET",
+            scheme="http",
+            authority=authority,
+        )
+        protocol = MockAsyncIterator(iter([]))
+        protocol.response_bytes = Mock()
+        protocol.response_stream = Mock(return_value=Stream())
+        await adapter(scope, protocol)
+        return protocol
+
+    async def run_requests(self, adapter, count=3, authorities=None, **kwargs):
+        authorities = authorities or [None] * count
+        tasks = [
+            asyncio.ensure_future(self.request(adapter, authority=authority, **kwargs))
+            for authority in authorities
+        ]
+        await asyncio.sleep(0)
+        self.release.set()
+        return await asyncio.gather(*tasks)
+
+    def adapter(self):
+        return ASGIToRSGIAdapter(self.app, single_flight=SingleFlight(["/status"]))
+
+    async def test_identical_requests_coalesced(self):
+        adapter = self.adapter()
+        protocols = await self.run_requests(adapter)
+        self.assertEqual(self.calls, 1)
+        for protocol in protocols:
+            protocol.response_bytes.assert_called_once_with(
+                status=200, headers=[], body=b"ab"
+            )
+        self.assertEqual(adapter.single_flight.coalesced, 2)
+        self.assertEqual(adapter.single_flight.in_flight, {})
+
+    async def test_other_paths_not_coalesced(self):
+        await self.run_requests(self.adapter(), path="/other")
+        self.assertEqual(self.calls, 3)
+
+    async def test_other_hosts_not_coalesced(self):
+        await self.run_requests(self.adapter(), authorities=["a", "b", "c"])
+        self.assertEqual(self.calls, 3)
+
+    async def test_streamed_response_releases_waiters(self):
+        finished = asyncio.Event()
+
+        async def app(scope, receive, send):
+            self.calls += 1
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ab", "more_body": True})
+            await finished.wait()
+            await send({"type": "http.response.body", "body": b"c"})
+
+        adapter = ASGIToRSGIAdapter(
+            app, send_high_watermark=1, single_flight=SingleFlight(["/status"])
+        )
+        tasks = [asyncio.ensure_future(self.request(adapter)) for _ in range(3)]
+        for _ in range(10):
+            await asyncio.sleep(0)
+        # the waiters run the app while the leader is still streaming
+        self.assertEqual(self.calls, 3)
+        finished.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(adapter.single_flight.coalesced, 0)
+
+    async def test_finish_keeps_newer_flight(self):
+        single_flight = SingleFlight(["/status"])
+        first = single_flight.start("key")
+        single_flight.finish("key", first)
+        second = single_flight.start("key")
+        # the first leader is done streaming after a new flight started
+        single_flight.finish("key", first)
+        self.assertIs(single_flight.leader("key"), second)
+        self.assertFalse(second.done())
+        single_flight.finish("key", second)
+        self.assertEqual(single_flight.in_flight, {})
+
+    def test_streaming_rejected(self):
+        with self.assertRaises(ValueError):
+            ASGIToRSGI(Mock(), streaming=True, single_flight=SingleFlight(["/"]))
+
+    async def test_private_requests_not_coalesced(self):
+        await self.run_requests(self.adapter(), headers={"authorization": "token"})
+        self.assertEqual(self.calls, 3)
+
+    async def test_set_cookie_not_shared(self):
+        self.headers = [(b"set-cookie", b"session=1")]
+        protocols = await self.run_requests(self.adapter())
+        self.assertEqual(self.calls, 3)
+        for protocol in protocols:
+            protocol.response_stream.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
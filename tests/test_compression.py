@@ -0,0 +1,238 @@
+import asyncio
+import os
+import tempfile
+import unittest
+import zlib
+from unittest.mock import AsyncMock, Mock, patch
+
+from rsgiadapter.asgi import ASGIToRSGIAdapter
+from rsgiadapter.compression import Compression, encoded_headers
+
+from .test_asgi import MockAsyncIterator, Stream, make_http_scope
+
+BODY = b"hello world " * 100
+
+
+def gunzip(data: bytes) -> bytes:
+    return zlib.decompress(data, 31)
+
+
+class TestCompression(unittest.TestCase):
+
+    def setUp(self):
+        self.compression = Compression(encodings=["gzip"])
+        self.headers = [("content-type", "text/html; charset=utf-8")]
+
+    def test_negotiate(self):
+        negotiate = self.compression.negotiate
+        accept = {"accept-encoding": "gzip, deflate"}
+        self.assertEqual(negotiate("GET", accept, 200, self.headers), "gzip")
+        self.assertIsNone(negotiate("HEAD", accept, 200, self.headers))
+        self.assertIsNone(negotiate("GET", accept, 304, self.headers))
+        self.assertIsNone(negotiate("GET", {}, 200, self.headers))
+        self.assertIsNone(
+            negotiate("GET", {"accept-encoding": "gzip;q=0"}, 200, self.headers)
+        )
+        self.assertIsNone(
+            negotiate("GET", accept, 200, [("content-type", "image/png")])
+        )
+        self.assertIsNone(
+            negotiate("GET", accept, 200, self.headers + [("content-encoding", "br")])
+        )
+        self.assertIsNone(
+            negotiate("GET", accept, 200, self.headers + [("content-length", "10")])
+        )
+
+    def test_compress(self):
+        data = self.compression.compress("gzip", [BODY[:10], BODY[10:]])
+        self.assertEqual(gunzip(data), BODY)
+
+    def test_stream_compressor_flushes(self):
+        compressor = Compression(encodings=["gzip"], flush_size=5).compressor("gzip")
+        decompressor = zlib.decompressobj(31)
+        self.assertEqual(decompressor.decompress(compressor.compress(b"abc")), b"")
+        self.assertEqual(
+            decompressor.decompress(compressor.compress(b"def")), b"abcdef"
+        )
+        decompressor.decompress(compressor.finish())
+        self.assertTrue(decompressor.eof)
+
+    def test_event_stream_not_compressed(self):
+        accept = {"accept-encoding": "gzip"}
+        headers = [("content-type", "text/event-stream")]
+        self.assertIsNone(self.compression.negotiate("GET", accept, 200, headers))
+
+    def test_encoded_headers(self):
+        headers = encoded_headers(
+            [("content-length", "1200"), ("etag", '"abc"'), ("vary", "cookie")],
+            "gzip",
+            100,
+        )
+        self.assertEqual(
+            headers,
+            [
+                ("etag", 'W/"abc"'),
+                ("content-encoding", "gzip"),
+                ("vary", "cookie, accept-encoding"),
+                ("content-length", "100"),
+            ],
+        )
+
+    def test_encoded_headers_keep_weak_etag(self):
+        headers = encoded_headers([("ETag", 'W/"abc"')], "gzip", None)
+        self.assertEqual(headers[0], ("ETag", 'W/"abc"'))
+
+    def test_encoded_headers_merge_vary(self):
+        headers = encoded_headers(
+            [("vary", "Cookie"), ("Vary", "Origin, Accept-Encoding")], "gzip", None
+        )
+        self.assertEqual(
+            headers,
+            [
+                ("content-encoding", "gzip"),
+                ("vary", "Cookie, Origin, Accept-Encoding"),
+            ],
+        )
+        headers = encoded_headers([("vary", "Cookie"), ("vary", "Origin")], "br", 1)
+        self.assertIn(("vary", "Cookie, Origin, accept-encoding"), headers)
+
+    def test_find_precompressed(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "app.js")
+        for name in (path, path + ".gz"):
+            with open(name, "wb") as f:
+                f.write(b"x")
+        find = self.compression.find_precompressed
+        self.assertEqual(
+            find({"accept-encoding": "gzip"}, 200, [], path), (path + ".gz", "gzip", 1)
+        )
+        self.assertIsNone(find({"accept-encoding": "br"}, 200, [], path))
+        self.assertIsNone(
+            find({"accept-encoding": "gzip", "range": "bytes=0-0"}, 200, [], path)
+        )
+
+
+class TestCompressedResponse(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.scope = make_http_scope(headers={"accept-encoding": "gzip"}, method="GET")
+        self.protocol = MockAsyncIterator(iter([]))
+        self.transport = Stream()
+        self.transport.send_bytes = AsyncMock()
+        self.protocol.response_stream = Mock(return_value=self.transport)
+        self.protocol.response_bytes = Mock()
+        self.protocol.response_empty = Mock()
+        self.protocol.response_file = Mock()
+        self.compression = Compression(encodings=["gzip"])
+
+    def app(self, *chunks, content_type=b"text/plain"):
+        async def app(scope, receive, send):
+            headers = [(b"content-type", content_type)]
+            await send(
+                {"type": "http.response.start", "status": 200, "headers": headers}
+            )
+            for i, chunk in enumerate(chunks):
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": i < len(chunks) - 1,
+                    }
+                )
+
+        return app
+
+    async def test_buffered(self):
+        adapter = ASGIToRSGIAdapter(
+            self.app(BODY[:600], BODY[600:]), compression=self.compression
+        )
+        await adapter(self.scope, self.protocol)
+        kwargs = self.protocol.response_bytes.call_args.kwargs
+        self.assertEqual(gunzip(kwargs["body"]), BODY)
+        self.assertIn(("content-encoding", "gzip"), kwargs["headers"])
+        self.assertIn(("content-length", str(len(kwargs["body"]))), kwargs["headers"])
+
+    async def test_large_body_compressed_in_thread(self):
+        body = b"x" * 300 * 1024
+        adapter = ASGIToRSGIAdapter(self.app(body), compression=self.compression)
+        with patch("asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+            await adapter(self.scope, self.protocol)
+        to_thread.assert_called_once()
+        kwargs = self.protocol.response_bytes.call_args.kwargs
+        self.assertEqual(gunzip(kwargs["body"]), body)
+
+    async def test_oversized_or_spilled_body_not_compressed(self):
+        compression = Compression(encodings=["gzip"], maximum_size=len(BODY) - 1)
+        adapter = ASGIToRSGIAdapter(self.app(BODY), compression=compression)
+        await adapter(self.scope, self.protocol)
+        self.assertEqual(self.protocol.response_bytes.call_args.kwargs["body"], BODY)
+        adapter = ASGIToRSGIAdapter(
+            self.app(BODY[:600], BODY[600:]),
+            compression=self.compression,
+            body_spill_threshold=100,
+        )
+        await adapter(self.scope, self.protocol)
+        data = b"".join(c.args[0] for c in self.transport.send_bytes.await_args_list)
+        self.assertEqual(data, BODY)
+
+    async def test_small_body_not_compressed(self):
+        adapter = ASGIToRSGIAdapter(self.app(b"hello"), compression=self.compression)
+        await adapter(self.scope, self.protocol)
+        self.protocol.response_bytes.assert_called_once_with(
+            status=200, headers=[("content-type", "text/plain")], body=b"hello"
+        )
+
+    async def test_content_type_not_compressed(self):
+        adapter = ASGIToRSGIAdapter(
+            self.app(BODY, content_type=b"image/png"), compression=self.compression
+        )
+        await adapter(self.scope, self.protocol)
+        self.assertEqual(self.protocol.response_bytes.call_args.kwargs["body"], BODY)
+
+    async def test_streaming(self):
+        adapter = ASGIToRSGIAdapter(
+            self.app(b"a" * 10, b"b" * 10, b""),
+            streaming=True,
+            compression=self.compression,
+        )
+        await adapter(self.scope, self.protocol)
+        headers = self.protocol.response_stream.call_args.kwargs["headers"]
+        self.assertIn(("content-encoding", "gzip"), headers)
+        self.assertNotIn("content-length", dict(headers))
+        data = b"".join(c.args[0] for c in self.transport.send_bytes.await_args_list)
+        self.assertEqual(gunzip(data), b"a" * 10 + b"b" * 10)
+
+    async def test_streaming_ratio(self):
+        chunks = [b'{"id": %d, "name": "item %d"}\n' % (i, i) for i in range(1000)]
+        adapter = ASGIToRSGIAdapter(
+            self.app(*chunks), streaming=True, compression=self.compression
+        )
+        await adapter(self.scope, self.protocol)
+        data = b"".join(c.args[0] for c in self.transport.send_bytes.await_args_list)
+        self.assertEqual(gunzip(data), b"".join(chunks))
+        whole = self.compression.compress("gzip", chunks)
+        self.assertLess(len(data), len(whole) * 1.1)
+
+    async def test_precompressed_pathsend(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "style.css")
+        for name in (path, path + ".gz"):
+            with open(name, "wb") as f:
+                f.write(b"x")
+
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.pathsend", "path": path})
+
+        adapter = ASGIToRSGIAdapter(app, compression=self.compression)
+        await adapter(self.scope, self.protocol)
+        kwargs = self.protocol.response_file.call_args.kwargs
+        self.assertEqual(kwargs["file"], path + ".gz")
+        self.assertIn(("content-encoding", "gzip"), kwargs["headers"])
+        self.assertIn(("content-length", "1"), kwargs["headers"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from email.utils import formatdate
+
+from rsgiadapter.files import parse_range, prepare_file_response
+
+
+class TestParseRange(unittest.TestCase):
+
+    def test_ranges(self):
+        self.assertEqual(parse_range("bytes=0-4", 10), (0, 5))
+        self.assertEqual(parse_range("bytes=5-", 10), (5, 10))
+        self.assertEqual(parse_range("bytes=-3", 10), (7, 10))
+        self.assertEqual(parse_range("bytes=8-20", 10), (8, 10))
+
+    def test_ignored(self):
+        self.assertIsNone(parse_range("bytes=0-1,3-4", 10))
+        self.assertIsNone(parse_range("items=0-1", 10))
+        self.assertIsNone(parse_range("bytes=a-b", 10))
+
+    def test_not_satisfiable(self):
+        with self.assertRaises(ValueError):
+            parse_range("bytes=10-", 10)
+        with self.assertRaises(ValueError):
+            parse_range("bytes=5-2", 10)
+
+
+class TestPrepareFileResponse(unittest.TestCase):
+
+    def setUp(self):
+        file = tempfile.NamedTemporaryFile(delete=False)
+        file.write(b"0123456789")
+        file.close()
+        self.path = file.name
+        self.addCleanup(os.unlink, self.path)
+        self.headers = [
+            ("content-type", "text/plain"),
+            ("content-length", "10"),
+            ("etag", '"abc"'),
+        ]
+
+    def prepare(self, request_headers, method="GET", status=200):
+        return prepare_file_response(
+            method, request_headers, status, self.headers, self.path
+        )
+
+    def test_no_conditional_headers(self):
+        self.assertEqual(self.prepare({}), (200, self.headers, None))
+
+    def test_if_none_match(self):
+        status, headers, file_range = self.prepare({"if-none-match": 'W/"abc"'})
+        self.assertEqual(status, 304)
+        self.assertEqual(headers, [("etag", '"abc"')])
+        self.assertIsNone(file_range)
+        self.assertEqual(self.prepare({"if-none-match": '"xyz"'})[0], 200)
+
+    def test_if_modified_since(self):
+        mtime = os.stat(self.path).st_mtime
+        self.assertEqual(
+            self.prepare({"if-modified-since": formatdate(mtime + 60, usegmt=True)})[0],
+            304,
+        )
+        self.assertEqual(
+            self.prepare({"if-modified-since": formatdate(mtime - 60, usegmt=True)})[0],
+            200,
+        )
+
+    def test_range(self):
+        status, headers, file_range = self.prepare({"range": "bytes=2-5"})
+        self.assertEqual(status, 206)
+        self.assertEqual(file_range, (2, 6))
+        self.assertIn(("content-range", "bytes 2-5/10"), headers)
+        self.assertIn(("content-length", "4"), headers)
+        self.assertNotIn(("content-length", "10"), headers)
+
+    def test_range_not_satisfiable(self):
+        status, headers, file_range = self.prepare({"range": "bytes=20-"})
+        self.assertEqual(status, 416)
+        self.assertIn(("content-range", "bytes */10"), headers)
+
+    def test_if_range_mismatch(self):
+        status, _, file_range = self.prepare({"range": "bytes=2-5", "if-range": '"x"'})
+        self.assertEqual(status, 200)
+        self.assertIsNone(file_range)
+
+    def test_only_ok_get_responses(self):
+        self.assertEqual(self.prepare({"range": "bytes=2-5"}, status=404)[0], 404)
+        self.assertEqual(self.prepare({"range": "bytes=2-5"}, method="POST")[0], 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+from unittest.mock import Mock
+
+from rsgiadapter.asgi import ASGIToRSGIAdapter
+from rsgiadapter.limiter import ConcurrencyLimiter
+
+from .test_asgi import MockAsyncIterator, make_http_scope
+
+
+class TestConcurrencyLimiter(unittest.IsolatedAsyncioTestCase):
+
+    async def test_queue_and_release(self):
+        limiter = ConcurrencyLimiter(1, max_queue=1)
+        self.assertTrue(await limiter.acquire())
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        self.assertEqual(limiter.queued, 1)
+        self.assertFalse(await limiter.acquire())
+        self.assertEqual(limiter.shed, 1)
+        limiter.release()
+        self.assertTrue(await waiting)
+        self.assertEqual(limiter.in_flight, 1)
+        limiter.release()
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_queue_timeout(self):
+        limiter = ConcurrencyLimiter(1, queue_timeout=0.01)
+        await limiter.acquire()
+        self.assertFalse(await limiter.acquire())
+        self.assertEqual(limiter.queued, 0)
+        limiter.release()
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_cancelled_waiter(self):
+        limiter = ConcurrencyLimiter(1)
+        await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(limiter.queued, 0)
+        limiter.release()
+        self.assertEqual(limiter.in_flight, 0)
+
+
+class TestLoadShedding(unittest.IsolatedAsyncioTestCase):
+
+    async def test_shed_with_503(self):
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        def request():
+            scope = make_http_scope()
+            protocol = MockAsyncIterator(iter([]))
+            protocol.response_bytes = Mock()
+            protocol.response_empty = Mock()
+            return scope, protocol
+
+        adapter = ASGIToRSGIAdapter(
+            app, limiter=ConcurrencyLimiter(1, max_queue=0, retry_after=2)
+        )
+        admitted, shed = request(), request()
+        task = asyncio.ensure_future(adapter(*admitted))
+        await asyncio.sleep(0)
+        await adapter(*shed)
+        shed[1].response_empty.assert_called_once_with(
+            status=503, headers=[("retry-after", "2"), ("connection", "close")]
+        )
+        release.set()
+        await task
+        admitted[1].response_bytes.assert_called_once()
+        self.assertEqual(adapter.limiter.in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
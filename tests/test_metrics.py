@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import AsyncMock, Mock
+
+from rsgiadapter.asgi import ASGIToRSGIAdapter
+from rsgiadapter.metrics import MetricsProtocol, RequestMetrics
+
+from .test_asgi import make_http_scope
+
+
+class BodyProtocol:
+
+    def __init__(self, *chunks):
+        self.chunks = list(chunks)
+        self.response_bytes = Mock()
+        self.response_empty = Mock()
+        self.transport = Mock(send_bytes=AsyncMock())
+        self.response_stream = Mock(return_value=self.transport)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.chunks:
+            raise StopAsyncIteration
+        return self.chunks.pop(0)
+
+
+class TestRequestMetrics(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.scope = make_http_scope("/upload", method="POST")
+        self.reported = []
+
+    async def echo_app(self, scope, receive, send):
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message["body"]
+            more_body = message["more_body"]
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": body})
+
+    async def test_buffered_response(self):
+        protocol = BodyProtocol(b"hello", b"world")
+        adapter = ASGIToRSGIAdapter(
+            self.echo_app, metrics_callback=self.reported.append
+        )
+        await adapter(self.scope, protocol)
+        protocol.response_bytes.assert_called_once_with(
+            status=200, headers=[], body=b"helloworld"
+        )
+        metrics = self.reported[0]
+        self.assertIsInstance(metrics, RequestMetrics)
+        self.assertEqual((metrics.method, metrics.path), ("POST", "/upload"))
+        self.assertEqual(metrics.status, 200)
+        self.assertEqual(metrics.response_type, "bytes")
+        self.assertEqual((metrics.bytes_in, metrics.chunks_in), (10, 2))
+        self.assertEqual((metrics.bytes_out, metrics.chunks_out), (10, 1))
+        self.assertGreaterEqual(
+            metrics.total_ns,
+            metrics.scope_ns + metrics.app_ns + metrics.buffer_ns + metrics.response_ns,
+        )
+
+    async def test_streamed_response(self):
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            for chunk in (b"a", b"bc"):
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": True}
+                )
+            await send({"type": "http.response.body", "body": b""})
+
+        protocol = BodyProtocol()
+        adapter = ASGIToRSGIAdapter(
+            app, streaming=True, metrics_callback=self.reported.append
+        )
+        await adapter(self.scope, protocol)
+        metrics = self.reported[0]
+        self.assertEqual(metrics.response_type, "stream")
+        self.assertEqual((metrics.bytes_out, metrics.chunks_out), (3, 2))
+        self.assertEqual(protocol.transport.send_bytes.await_count, 2)
+
+    async def test_callback_error_logged(self):
+        adapter = ASGIToRSGIAdapter(
+            self.echo_app, metrics_callback=Mock(side_effect=ValueError)
+        )
+        with self.assertLogs("rsgiadapter", "WARNING"):
+            await adapter(self.scope, BodyProtocol())
+
+    def test_missing_protocol_method(self):
+        protocol = MetricsProtocol(object(), RequestMetrics("GET", "/"))
+        self.assertFalse(hasattr(protocol, "response_file_range"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from rsgiadapter.asgi import ASGIToRSGIAdapter
+from rsgiadapter.multipart import (
+    MultipartError,
+    MultipartParser,
+    MultipartUploads,
+    parse_header_params,
+)
+
+from .test_asgi import MockAsyncIterator, make_http_scope
+
+BODY = (
+    b"preamble\r\n"
+    b"--XyZ\r\n"
+    b'Content-Disposition: form-data; name="title"\r\n'
+    b"\r\n"
+    b"hello\r\n"
+    b"--XyZ\r\n"
+    b'Content-Disposition: form-data; name="file"; filename="a;b.txt"\r\n'
+    b"Content-Type: text/plain\r\n"
+    b"\r\n"
+    b"line\r\n--Xy not a boundary\r\n"
+    b"--XyZ--\r\n"
+)
+
+
+class TestMultipartParser(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def parse(self, body, chunk_size):
+        parser = MultipartParser(b"XyZ", self.directory.name)
+        for i in range(0, len(body), chunk_size):
+            parser.feed(body[i : i + chunk_size])
+        return parser
+
+    def test_parse_header_params(self):
+        self.assertEqual(
+            parse_header_params('form-data; name="a"; filename="b;c.txt"'),
+            ("form-data", {"name": "a", "filename": "b;c.txt"}),
+        )
+
+    def test_parse(self):
+        for chunk_size in (1, 7, len(BODY)):
+            parser = self.parse(BODY, chunk_size)
+            uploads = parser.finish()
+            self.assertEqual(uploads["fields"], [("title", "hello")])
+            [file] = uploads["files"]
+            self.assertEqual(file["filename"], "a;b.txt")
+            self.assertEqual(file["content_type"], "text/plain")
+            self.assertEqual(file["size"], 25)
+            with open(file["path"], "rb") as f:
+                self.assertEqual(f.read(), b"line\r\n--Xy not a boundary")
+            self.assertEqual(os.path.dirname(file["path"]), self.directory.name)
+            parser.cleanup()
+            self.assertFalse(os.path.exists(file["path"]))
+
+    def test_truncated_body(self):
+        parser = self.parse(BODY[:-10], 10)
+        with self.assertRaises(MultipartError):
+            parser.finish()
+        parser.cleanup()
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_field_too_large(self):
+        parser = MultipartParser(b"XyZ", max_field_size=3)
+        with self.assertRaises(MultipartError):
+            parser.feed(BODY)
+        parser.cleanup()
+
+
+class TestMultipartUploads(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        headers = {
+            "content-type": "multipart/form-data; boundary=XyZ",
+            "content-length": str(len(BODY)),
+        }
+        self.scope = make_http_scope("/upload", headers, method="POST")
+        self.protocol = MockAsyncIterator(iter([BODY[:50], BODY[50:]]))
+        self.protocol.response_empty = Mock()
+        self.protocol.response_bytes = Mock()
+
+    async def test_files_in_scope_extension(self):
+        seen = {}
+
+        async def app(scope, receive, send):
+            uploads = scope["extensions"]["rsgiadapter.multipart"]
+            seen["message"] = await receive()
+            seen["headers"] = scope["headers"]
+            seen["path"] = uploads["files"][0]["path"]
+            seen["exists"] = os.path.exists(seen["path"])
+            await send({"type": "http.response.start", "status": 204, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        adapter = ASGIToRSGIAdapter(app, multipart=MultipartUploads(["/upload"]))
+        await adapter(self.scope, self.protocol)
+        self.assertEqual(seen["message"]["body"], b"")
+        self.assertEqual(
+            seen["headers"],
+            [
+                (b"content-type", b"multipart/form-data; boundary=XyZ"),
+                (b"content-length", b"0"),
+            ],
+        )
+        self.assertTrue(seen["exists"])
+        self.assertFalse(os.path.exists(seen["path"]))
+        extensions = adapter.make_asgi_scope(self.scope)["extensions"]
+        self.assertNotIn("rsgiadapter.multipart", extensions)
+        self.protocol.response_empty.assert_called_once_with(status=204, headers=[])
+
+    async def test_invalid_body(self):
+        app = Mock()
+        self.protocol = MockAsyncIterator(iter([BODY[:-10]]))
+        self.protocol.response_empty = Mock()
+        adapter = ASGIToRSGIAdapter(app, multipart=MultipartUploads(["/upload"]))
+        await adapter(self.scope, self.protocol)
+        app.assert_not_called()
+        self.protocol.response_empty.assert_called_once_with(
+            status=400, headers=[("connection", "close")]
+        )
+
+    async def test_invalid_boundary(self):
+        app = Mock()
+        for boundary in ("", "é", "x" * 71, "trailing "):
+            self.scope.headers["content-type"] = (
+                f'multipart/form-data; boundary="{boundary}"'
+            )
+            self.protocol.response_empty = Mock()
+            adapter = ASGIToRSGIAdapter(app, multipart=MultipartUploads(["/upload"]))
+            await adapter(self.scope, self.protocol)
+            app.assert_not_called()
+            self.protocol.response_empty.assert_called_once_with(
+                status=400, headers=[("connection", "close")]
+            )
+
+    async def test_declared_body_too_large(self):
+        app = Mock()
+        body = iter([BODY])
+        self.protocol.iterator = body
+        adapter = ASGIToRSGIAdapter(
+            app, max_body_size=10, multipart=MultipartUploads(["/upload"])
+        )
+        await adapter(self.scope, self.protocol)
+        app.assert_not_called()
+        self.assertEqual(list(body), [BODY])
+        self.protocol.response_empty.assert_called_once_with(
+            status=413, headers=[("connection", "close")]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import AsyncMock, Mock
+
+from rsgiadapter.asgi import ASGIToRSGI, ASGIToRSGIAdapter
+from rsgiadapter.offload import ThreadOffload
+
+from .test_asgi import MockAsyncIterator, make_http_scope
+
+
+class TestThreadOffload(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.offload = ThreadOffload(["/sync"], max_workers=2)
+        self.addAsyncCleanup(self.offload.shutdown)
+        self.threads = []
+
+    async def app(self, scope, receive, send):
+        self.threads.append(threading.current_thread())
+        message = await receive()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": message["body"]})
+
+    async def request(self, path):
+        scope = make_http_scope(path, {"content-length": "4"})
+        protocol = Mock(return_value=asyncio.sleep(0, b"body"))
+        protocol.response_bytes = Mock()
+        adapter = ASGIToRSGIAdapter(self.app, offload=self.offload)
+        await adapter(scope, protocol)
+        return protocol
+
+    async def test_offloaded_path(self):
+        protocol = await self.request("/sync/view")
+        protocol.response_bytes.assert_called_once_with(
+            status=200, headers=[], body=b"body"
+        )
+        self.assertIsNot(self.threads[0], threading.current_thread())
+        self.assertEqual(self.offload.completed, 1)
+        self.assertEqual((self.offload.queued, self.offload.active), (0, 0))
+
+    async def test_other_path_on_worker_loop(self):
+        protocol = await self.request("/async")
+        protocol.response_bytes.assert_called_once()
+        self.assertIs(self.threads[0], threading.current_thread())
+        self.assertIsNone(self.offload.executor)
+
+    async def test_blocking_requests_run_in_parallel(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        async def app(scope, receive, send):
+            barrier.wait()
+            await send({"type": "http.response.start", "status": 204, "headers": []})
+
+        adapter = ASGIToRSGIAdapter(app, streaming=True, offload=self.offload)
+
+        def request():
+            scope = make_http_scope("/sync")
+            protocol = MockAsyncIterator(iter([]))
+            protocol.response_empty = Mock()
+            return adapter(scope, protocol)
+
+        await asyncio.gather(request(), request())
+        self.assertEqual(self.offload.completed, 2)
+
+    async def test_send_after_cancel(self):
+        started = threading.Event()
+        resume = threading.Event()
+        seen = []
+
+        async def app(scope, receive, send):
+            started.set()
+            resume.wait(5)
+            seen.append(await receive())
+            try:
+                await send({"type": "http.response.start", "status": 200})
+            except OSError as exc:
+                seen.append(exc)
+
+        receive = AsyncMock()
+        send = AsyncMock()
+        task = asyncio.ensure_future(self.offload.run(app, {}, receive, send))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        resume.set()
+        await self.offload.shutdown()
+        self.assertEqual(seen[0], {"type": "http.disconnect"})
+        self.assertIsInstance(seen[1], OSError)
+        receive.assert_not_called()
+        send.assert_not_called()
+
+    async def test_shutdown_with_request_in_flight(self):
+        started = threading.Event()
+        resume = threading.Event()
+
+        async def app(scope, receive, send):
+            if scope["type"] == "lifespan":
+                return
+            started.set()
+            resume.wait(5)
+            await receive()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"done"})
+
+        rsgi_app = ASGIToRSGI(app, offload=self.offload, asgi_lifespan=False)
+        scope = make_http_scope("/sync", {"content-length": "0"})
+        protocol = Mock(return_value=asyncio.sleep(0, b""))
+        protocol.response_bytes = Mock()
+        request = asyncio.ensure_future(rsgi_app.adapter(scope, protocol))
+        await asyncio.to_thread(started.wait, 5)
+        shutdown = asyncio.ensure_future(rsgi_app.shutdown())
+        await asyncio.sleep(0)
+        resume.set()
+        await asyncio.wait_for(asyncio.gather(request, shutdown), 5)
+        protocol.response_bytes.assert_called_once_with(
+            status=200, headers=[], body=b"done"
+        )
+        self.assertIsNone(self.offload.executor)
+
+
+if __name__ == "__main__":
+    unittest.main()
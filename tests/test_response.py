@@ -29,13 +29,58 @@ class TestAppendMethod(unittest.TestCase):
         self.body.append(data)
         self.assertEqual(self.body._body_length, 1)
 
-    def test_chunk_size_updated(self):
+    def test_chunk_size_not_updated(self):
         data = b"test"
         self.body.append(data)
-        self.assertEqual(self.body.chunk_size, len(data))
+        self.assertIsNone(self.body.chunk_size)
 
     def test_closed_body_cleared(self):
         self.body._body.close()
         self.body._body = MagicMock()
         self.body.clear_body()
         self.assertEqual(self.body._body_length, 0)
+
+
+class TestBodyBackend(unittest.TestCase):
+
+    def test_memory_body_keeps_chunks(self):
+        body = BodyManager()
+        body.append(b"hello")
+        body.append(b"world!")
+        self.assertFalse(body.spilled)
+        self.assertEqual(list(body), [b"hello", b"world!"])
+        self.assertEqual(body.get_body(), b"helloworld!")
+
+    def test_spill_above_threshold(self):
+        body = BodyManager(spill_threshold=8)
+        body.append(b"hello")
+        self.assertFalse(body.spilled)
+        body.append(b"world")
+        self.assertTrue(body.spilled)
+        self.assertEqual(body.get_body(), b"helloworld")
+
+    def test_clear_body_resets_to_memory(self):
+        body = BodyManager(spill_threshold=0)
+        body.append(b"hello")
+        self.assertTrue(body.spilled)
+        body.clear_body()
+        self.assertFalse(body.spilled)
+        self.assertEqual(len(body), 0)
+        self.assertEqual(body.get_body(), b"")
+
+
+class TestChunkBoundaries(unittest.TestCase):
+
+    def test_spilled_body_keeps_chunks(self):
+        body = BodyManager(spill_threshold=0)
+        body.append(b"a")
+        body.append(b"large chunk")
+        body.append(b"bc")
+        self.assertTrue(body.spilled)
+        self.assertEqual(list(body), [b"a", b"large chunk", b"bc"])
+
+    def test_coalesce_chunks(self):
+        body = BodyManager(chunk_size=4)
+        for chunk in (b"a", b"b", b"c", b"d", b"large chunk", b"e"):
+            body.append(chunk)
+        self.assertEqual(list(body), [b"abcd", b"large chunk", b"e"])
@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+from unittest.mock import Mock
+
+from rsgiadapter.asgi import ASGIToRSGIAdapter
+from rsgiadapter.transport import WatermarkTransport
+
+from .test_asgi import make_http_scope
+
+
+class SlowTransport:
+
+    def __init__(self):
+        self.sent = []
+        self.release = asyncio.Event()
+
+    async def send_bytes(self, data):
+        await self.release.wait()
+        self.sent.append(data)
+
+
+class TestWatermarkTransport(unittest.IsolatedAsyncioTestCase):
+
+    async def test_send_blocks_above_high_watermark(self):
+        transport = SlowTransport()
+        writer = WatermarkTransport(transport, high_watermark=10, low_watermark=0)
+        await writer.send_bytes(b"x" * 10)
+        blocked = asyncio.ensure_future(writer.send_bytes(b"y"))
+        await asyncio.sleep(0)
+        self.assertFalse(blocked.done())
+        self.assertEqual(writer.size, 11)
+
+        transport.release.set()
+        await asyncio.wait_for(blocked, 1)
+        await writer.close()
+        self.assertEqual(transport.sent, [b"x" * 10, b"y"])
+        self.assertEqual(writer.size, 0)
+
+    async def test_error_raised_to_sender(self):
+        transport = Mock()
+        transport.send_bytes = Mock(side_effect=ConnectionError)
+        writer = WatermarkTransport(transport, high_watermark=0)
+        with self.assertRaises(ConnectionError):
+            await writer.send_bytes(b"x")
+        await writer.close()
+
+
+class TestBoundedBuffer(unittest.IsolatedAsyncioTestCase):
+
+    async def test_buffered_response_streams_above_watermark(self):
+        scope = make_http_scope()
+        transport = SlowTransport()
+        transport.release.set()
+        protocol = Mock()
+        protocol.response_stream = Mock(return_value=transport)
+        streamed_before_end = []
+
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            for _ in range(3):
+                await send(
+                    {"type": "http.response.body", "body": b"x" * 4, "more_body": True}
+                )
+            await asyncio.sleep(0)
+            streamed_before_end.extend(transport.sent)
+            await send({"type": "http.response.body", "body": b"end"})
+
+        adapter = ASGIToRSGIAdapter(app, send_high_watermark=8)
+        await adapter(scope, protocol)
+        protocol.response_stream.assert_called_once_with(status=200, headers=[])
+        protocol.response_bytes.assert_not_called()
+        self.assertEqual(streamed_before_end, [b"x" * 4] * 3)
+        self.assertEqual(transport.sent, [b"x" * 4] * 3 + [b"end"])
+
+
+if __name__ == "__main__":
+    unittest.main()